@@ -6,9 +6,10 @@ from contextlib import asynccontextmanager
 from typing import Annotated
 import models
 # === Third-Party Library Imports ===
+import anyio.to_thread
 from celery import Celery
 from celery_utils_endpoints import celery_utils_router
-from database import SessionLocal, engine
+from database import SessionLocal, add_missing_columns, engine
 from developer_endpoints import developer_router
 from fastapi import (Depends, FastAPI)
 from fastapi.middleware.cors import CORSMiddleware
@@ -22,11 +23,15 @@ from slowapi.util import get_remote_address
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
 from verifier_endpoints import verifier_router
+from verification_stages import shutdown_verification_pool
 from auth_utils import AUTH_ENABLED
 
 # === Load Environment Variables ===
 logger = logging.getLogger(__name__)
 
+# Threads shared by the sync (def) routes and dependencies, which do the blocking storage, database and hashing work
+API_THREADPOOL_SIZE = int(os.getenv("API_THREADPOOL_SIZE", 40))
+
 # === Azure Auth Settings Configuration ===
 
 
@@ -67,6 +72,9 @@ db_dependency = Annotated[Session, Depends(get_db)]
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Size the thread pool that keeps blocking work off the event loop
+    anyio.to_thread.current_default_thread_limiter().total_tokens = API_THREADPOOL_SIZE
+
     if AUTH_ENABLED:
         from auth_utils import azure_scheme
         # Load OpenID config immediately if authentication is enabled
@@ -80,6 +88,9 @@ async def lifespan(app: FastAPI):
 
     yield
 
+    # Stop the processes of the verification pool
+    shutdown_verification_pool()
+
 
 # Create FastAPI app with lifespan and conditional Swagger UI oauth configuration
 if AUTH_ENABLED:
@@ -107,6 +118,8 @@ def initialize_database_with_retry(retries=60, delay=10):
         try:
             # Create tables if they don't exist
             models.Base.metadata.create_all(bind=engine)
+            # Add columns introduced since the tables were created
+            add_missing_columns(models.Base.metadata)
             logger.info("Database initialized successfully.")
             return
         except OperationalError as e:
@@ -24,7 +24,7 @@ celery_utils_router = APIRouter(
 
 
 @celery_utils_router.get("/tasks", response_model=List[Dict])
-async def get_all_tasks(db: Session = Depends(get_db)):
+def get_all_tasks(db: Session = Depends(get_db)):
     """
     Returns all tasks (finished, failed, or pending) using AsyncResult.
     """
@@ -56,7 +56,7 @@ async def get_all_tasks(db: Session = Depends(get_db)):
 
 
 @celery_utils_router.get("/tasks/running", response_model=List[Dict])
-async def get_running_tasks(db: Session = Depends(get_db)):
+def get_running_tasks(db: Session = Depends(get_db)):
     """
     Returns all currently running tasks in detail using query_results.
     """
@@ -92,7 +92,7 @@ async def get_running_tasks(db: Session = Depends(get_db)):
 
 
 @celery_utils_router.get("/tasks/my", response_model=List[Dict])
-async def get_my_tasks(
+def get_my_tasks(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
@@ -128,7 +128,7 @@ async def get_my_tasks(
 
 
 @celery_utils_router.get("/tasks/running/my", response_model=List[Dict])
-async def get_my_running_tasks(
+def get_my_running_tasks(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
@@ -168,7 +168,7 @@ async def get_my_running_tasks(
 
 
 @celery_utils_router.get("/tasks/running/my/{job_id}", response_model=Dict)
-async def get_my_running_task_by_id(
+def get_my_running_task_by_id(
     job_id: str,
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
@@ -217,7 +217,7 @@ async def get_my_running_task_by_id(
 
 
 @celery_utils_router.get("/tasks/my/{job_id}", response_model=Dict)
-async def get_my_task_by_id(
+def get_my_task_by_id(
     job_id: str,
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
@@ -252,7 +252,7 @@ async def get_my_task_by_id(
 
 
 @celery_utils_router.get("/workers/stats", response_model=Dict[str, Dict])
-async def get_workers_stats():
+def get_workers_stats():
     """
     Returns statistics of all running workers.
     """
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -19,3 +19,31 @@ SessionLocal = sessionmaker(
 )
 
 Base = declarative_base()
+
+
+def add_missing_columns(metadata):
+    """
+    Add the columns of the models that are missing from existing tables.
+    create_all only creates missing tables, so columns added to a model later (e.g. the input
+    digests of Job) are added here on startup. Running it again is a no-op.
+
+    Args:
+        metadata (MetaData): Metadata of the models (Base.metadata).
+    """
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing_columns = {column["name"]
+                                for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                if not column.nullable:
+                    raise RuntimeError(
+                        f"Cannot add the non-nullable column {table.name}.{column.name} to an existing table.")
+                connection.execute(text(
+                    f"ALTER TABLE {preparer.quote(table.name)} ADD COLUMN {preparer.quote(column.name)} "
+                    f"{column.type.compile(dialect=engine.dialect)} NULL"))
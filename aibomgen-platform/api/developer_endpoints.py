@@ -1,5 +1,3 @@
-import os
-import shutil
 import uuid
 from typing import Literal, Optional
 from fastapi.responses import RedirectResponse
@@ -11,8 +9,9 @@ from fastapi import (APIRouter, Depends, File, Form, HTTPException, Request,
 from fastapi_azure_auth.user import User
 from models import Job
 from shared.minio_utils import (TRAINING_BUCKET, generate_presigned_url,
-                                list_files_in_bucket, upload_file_to_minio)
+                                list_files_in_bucket, upload_fileobjs_to_minio)
 from shared.zip_utils import ZipValidationError, validate_zip_file
+from shared.in_toto_utils import hash_fileobj
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from sqlalchemy.orm import Session
@@ -38,7 +37,7 @@ def get_db():
 
 @developer_router.post("/submit_job_by_model_and_data", dependencies=[Depends(get_current_user)])
 @limiter.limit("5/minute")  # Limit to 5 requests per minute
-async def submit_job(
+def submit_job(
     request: Request,
     # Use Depends to get the user object
     user: User = Depends(get_current_user),
@@ -134,25 +133,15 @@ Args:
         # Generate a unique directory for the job
         unique_dir = str(uuid.uuid4())
 
-        # Save files temporarily
-        temp_dir = os.path.join("/tmp", unique_dir)
-        os.makedirs(temp_dir, exist_ok=True)
-
-        model_path = os.path.join(temp_dir, model.filename)
-        dataset_path = os.path.join(temp_dir, dataset.filename)
-        dataset_definition_path = os.path.join(
-            temp_dir, dataset_definition.filename)
-
-        with open(model_path, "wb") as buffer:
-            shutil.copyfileobj(model.file, buffer)
-        with open(dataset_path, "wb") as buffer:
-            shutil.copyfileobj(dataset.file, buffer)
-        with open(dataset_definition_path, "wb") as buffer:
-            shutil.copyfileobj(dataset_definition.file, buffer)
+        # Hash the uploads where Starlette spooled them, the digests are set as object metadata when each upload starts
+        model_sha256, model_size = hash_fileobj(model.file)
+        dataset_sha256, dataset_size = hash_fileobj(dataset.file)
+        dataset_definition_sha256, dataset_definition_size = hash_fileobj(
+            dataset_definition.file)
 
         # Load the dataset definition to determine the dataset type
-        with open(dataset_definition_path, "r") as f:
-            dataset_definition_yaml = yaml.safe_load(f)
+        dataset_definition_yaml = yaml.safe_load(dataset_definition.file)
+        dataset_definition.file.seek(0)
 
         dataset_type = dataset_definition_yaml.get(
             "type", "csv")  # Default to 'csv' if not specified
@@ -160,17 +149,22 @@ Args:
         # Validate the dataset .zip file only if the type is 'image'
         if dataset_type == "image":
             try:
-                validate_zip_file(dataset_path)  # Ensure the .zip file is safe
+                # Ensure the .zip file is safe
+                validate_zip_file(dataset.file)
             except ZipValidationError as e:
                 raise HTTPException(status_code=400, detail=str(e))
-
-        # Upload files to MinIO
-        model_url = upload_file_to_minio(
-            model_path, f"{unique_dir}/model/{model.filename}", TRAINING_BUCKET)
-        dataset_url = upload_file_to_minio(
-            dataset_path, f"{unique_dir}/dataset/{dataset.filename}", TRAINING_BUCKET)
-        dataset_definition_url = upload_file_to_minio(
-            dataset_definition_path, f"{unique_dir}/definition/{dataset_definition.filename}", TRAINING_BUCKET)
+            finally:
+                dataset.file.seek(0)
+
+        # Stream the uploads to MinIO in parallel, with their digests as object metadata for the worker to check
+        model_url, dataset_url, dataset_definition_url = upload_fileobjs_to_minio([
+            (model.file, f"{unique_dir}/model/{model.filename}", TRAINING_BUCKET,
+             {"sha256": model_sha256}),
+            (dataset.file, f"{unique_dir}/dataset/{dataset.filename}", TRAINING_BUCKET,
+             {"sha256": dataset_sha256}),
+            (dataset_definition.file, f"{unique_dir}/definition/{dataset_definition.filename}", TRAINING_BUCKET,
+             {"sha256": dataset_definition_sha256}),
+        ])
 
         # Send Celery task with file URLs
         task = celery_app.send_task(
@@ -209,6 +203,12 @@ Args:
             id=task.id,
             user_id=user_id,
             unique_dir=unique_dir,
+            model_sha256=model_sha256,
+            model_size=model_size,
+            dataset_sha256=dataset_sha256,
+            dataset_size=dataset_size,
+            dataset_definition_sha256=dataset_definition_sha256,
+            dataset_definition_size=dataset_definition_size,
         )
         db.add(job)
         db.commit()
@@ -221,7 +221,7 @@ Args:
 
 
 @developer_router.get("/job_status/{job_id}", dependencies=[Depends(get_current_user)])
-async def job_status(job_id: str, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def job_status(job_id: str, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     user_id = user.claims.get("oid")
 
     job = db.query(Job).filter(Job.id == job_id).first()
@@ -238,7 +238,7 @@ async def job_status(job_id: str, user: User = Depends(get_current_user), db: Se
 
 
 @developer_router.get("/job_artifacts/{job_id}", dependencies=[Depends(get_current_user)])
-async def get_job_artifacts(job_id: str, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_job_artifacts(job_id: str, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     user_id = user.claims.get("oid")
 
     job = db.query(Job).filter(Job.id == job_id).first()
@@ -256,7 +256,7 @@ async def get_job_artifacts(job_id: str, user: User = Depends(get_current_user),
 
 
 @developer_router.get("/job_artifacts/{job_id}/{artifact_name}", dependencies=[Depends(get_current_user)])
-async def download_artifact(job_id: str, artifact_name: str, user: User = Depends(get_current_user), db: Session = Depends(get_db), redirect: bool = True, test_mode: bool = True):
+def download_artifact(job_id: str, artifact_name: str, user: User = Depends(get_current_user), db: Session = Depends(get_db), redirect: bool = True, test_mode: bool = True):
     user_id = user.claims.get("oid")
 
     job = db.query(Job).filter(Job.id == job_id).first()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String
+from sqlalchemy import BigInteger, Column, String
 from database import Base
 
 # This file defines the database models using SQLAlchemy ORM.
@@ -10,4 +10,11 @@ class Job(Base):
     id = Column(String(255), primary_key=True)  # Specify length for VARCHAR
     user_id = Column(String(255), nullable=False)  # Specify length for VARCHAR
     unique_dir = Column(String(255), nullable=False)  # Specify length for VARCHAR
+    # Digests of the submitted inputs, computed from the spooled uploads before they are stored
+    model_sha256 = Column(String(64), nullable=True)  # Hex encoded SHA256
+    model_size = Column(BigInteger, nullable=True)  # Size in bytes
+    dataset_sha256 = Column(String(64), nullable=True)
+    dataset_size = Column(BigInteger, nullable=True)
+    dataset_definition_sha256 = Column(String(64), nullable=True)
+    dataset_definition_size = Column(BigInteger, nullable=True)
     # Add other fields as necessary
\ No newline at end of file
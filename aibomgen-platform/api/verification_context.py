@@ -0,0 +1,101 @@
+import os
+import json
+import threading
+from fastapi import HTTPException
+from in_toto.models.metadata import Metablock
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+from cyclonedx.validation.json import JsonStrictValidator
+from cyclonedx.schema import SchemaVersion
+
+# Verification inputs, mounted as Docker secrets
+SIGNED_LAYOUT_PATH = "/run/secrets/signed_layout"
+WORKER_PUBLIC_KEY_PATH = "/run/secrets/worker_public_key"
+
+
+def _load_layout(layout_path):
+    """Load the signed layout and the .link filenames it expects (one per step and key)."""
+    layout_metadata = Metablock.load(layout_path)
+    expected_filenames = []
+    for step in layout_metadata.signed.steps:
+        for keyid in layout_metadata.signed.keys.keys():
+            expected_filenames.append(f"{step.name}.{keyid[:8]}.link")
+    return layout_metadata, expected_filenames
+
+
+def _load_worker_public_key(worker_public_key_path):
+    """Load and validate the worker's Ed25519 public key from its JSON file."""
+    with open(worker_public_key_path, "r") as f:
+        public_key_data = json.load(f)
+
+    if public_key_data["keytype"] != "ed25519" or public_key_data["scheme"] != "ed25519":
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid public key format. Expected Ed25519 key.",
+        )
+
+    return Ed25519PublicKey.from_public_bytes(bytes.fromhex(public_key_data["keyval"]["public"]))
+
+
+class VerificationContext:
+    """
+    Verification inputs shared by all verifier routes of this API process: the signed layout,
+    the worker public key and the BOM schema validator.
+    Files are parsed once and reloaded only when their modification time or size changes.
+    """
+
+    def __init__(self, layout_path=SIGNED_LAYOUT_PATH, worker_public_key_path=WORKER_PUBLIC_KEY_PATH):
+        self.layout_path = layout_path
+        self.worker_public_key_path = worker_public_key_path
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._bom_validator = JsonStrictValidator(SchemaVersion.V1_6)
+
+    def _load(self, path, loader, missing_detail):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            raise HTTPException(status_code=500, detail=missing_detail)
+        version = (st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            cached = self._cache.get(path)
+            if cached and cached[0] == version:
+                return cached[1]
+            value = loader(path)
+            self._cache[path] = (version, value)
+            return value
+
+    def _layout(self):
+        return self._load(
+            self.layout_path, _load_layout,
+            f"The signed layout file does not exist. Please ensure it is available at '{self.layout_path}'.")
+
+    @property
+    def layout(self):
+        """The signed in-toto layout (Metablock)."""
+        return self._layout()[0]
+
+    @property
+    def expected_link_filenames(self):
+        """The .link filenames the layout expects, e.g. run_training.<keyid[:8]>.link."""
+        return self._layout()[1]
+
+    @property
+    def worker_public_key(self):
+        """The worker's Ed25519 public key, used to verify BOM signatures."""
+        return self._load(
+            self.worker_public_key_path, _load_worker_public_key,
+            "Worker public key not found. Please ensure it is available at the specified path.")
+
+    @property
+    def bom_validator(self):
+        """CycloneDX 1.6 strict JSON validator; it compiles its schema on first use and keeps it."""
+        return self._bom_validator
+
+
+verification_context = VerificationContext()
+
+
+def get_verification_context():
+    """FastAPI dependency returning the process-wide verification context."""
+    return verification_context
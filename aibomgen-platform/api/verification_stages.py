@@ -0,0 +1,235 @@
+import os
+import json
+import base64
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+from fastapi import HTTPException
+from in_toto.models.metadata import Metablock
+from in_toto.models.link import FILENAME_FORMAT
+from in_toto.verifylib import in_toto_verify
+from cryptography.exceptions import InvalidSignature
+from cyclonedx.model.bom import Bom
+from cyclonedx.output.json import JsonV1Dot6
+from shared.minio_utils import get_json_from_minio, TRAINING_BUCKET
+from shared.bom_signature import BOM_SIGNATURE_PROPERTY, BOM_SIGNATURE_SCHEME_PROPERTY, JCS_SIGNATURE_SCHEME, get_bom_property, bom_signing_payload
+from verification_context import VerificationContext, verification_context
+
+# CPU-bound verifier stages (schema validation, BOM parsing and canonicalization, signature and
+# in-toto checks) and the process pool that runs them, so they are not serialized by the GIL.
+
+# Processes of the verification pool, 0 runs the stages in the calling thread
+VERIFY_PROCESS_POOL_SIZE = int(
+    os.getenv("VERIFY_PROCESS_POOL_SIZE", os.cpu_count() or 1))
+
+_verification_pool = None
+_verification_pool_lock = threading.Lock()
+
+
+class VerificationStageError(Exception):
+    """Picklable stand-in for an HTTPException raised by a stage in a pool process."""
+
+    def __init__(self, status_code, detail):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def get_verification_pool():
+    """Return the verification process pool, creating it on first use. None if the pool is disabled."""
+    global _verification_pool
+    if VERIFY_PROCESS_POOL_SIZE <= 0:
+        return None
+    with _verification_pool_lock:
+        if _verification_pool is None:
+            # Spawned, not forked: the API process runs threads that must not be copied mid-operation
+            _verification_pool = ProcessPoolExecutor(
+                max_workers=VERIFY_PROCESS_POOL_SIZE,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _verification_pool
+
+
+def shutdown_verification_pool():
+    """Stop the verification pool processes, e.g. when the API shuts down."""
+    global _verification_pool
+    with _verification_pool_lock:
+        if _verification_pool is not None:
+            _verification_pool.shutdown(wait=True, cancel_futures=True)
+            _verification_pool = None
+
+
+def _run_stage(stage, shared_data, args):
+    # Runs in a pool process: the payload is read from shared memory, never pickled
+    if shared_data is not None:
+        name, size = shared_data
+        shm = SharedMemory(name=name)
+        try:
+            args = (bytes(shm.buf[:size]),) + args
+        finally:
+            shm.close()
+    try:
+        return stage(*args)
+    except HTTPException as e:
+        raise VerificationStageError(e.status_code, e.detail)
+
+
+def run_verification_stage(stage, *args, data=None):
+    """
+    Run a verification stage in the process pool and wait for its result.
+
+    Args:
+        stage (callable): Module-level stage function.
+        *args: Small picklable arguments (e.g. a MinIO object name).
+        data (bytes, optional): Payload passed to the stage as its first argument, through shared memory.
+
+    Returns:
+        The result of the stage. Its exceptions are re-raised, HTTPExceptions included.
+    """
+    global _verification_pool
+    pool = get_verification_pool()
+    if pool is None:
+        return stage(*(((data,) if data is not None else ()) + args))
+
+    shm = None
+    try:
+        shared_data = None
+        if data is not None:
+            shm = SharedMemory(create=True, size=max(len(data), 1))
+            shm.buf[:len(data)] = data
+            shared_data = (shm.name, len(data))
+        return pool.submit(_run_stage, stage, shared_data, args).result()
+    except VerificationStageError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except BrokenProcessPool:
+        # A pool process died, start a new pool for the next requests
+        with _verification_pool_lock:
+            if _verification_pool is pool:
+                _verification_pool = None
+        raise
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+
+# === Stages ===
+
+
+def check_bom(bom_data: bytes) -> str:
+    """
+    Validate a BOM against the CycloneDX schema and verify its signature.
+
+    Returns:
+        str: The MinIO path of the in-toto .link file the BOM references.
+    """
+    bom_data = bom_data.decode("utf-8")
+
+    # Validate the BOM against the CycloneDX schema
+    validation_errors = verification_context.bom_validator.validate_str(
+        bom_data)
+    if validation_errors:
+        raise HTTPException(
+            status_code=400,
+            detail=f"BOM validation failed: {repr(validation_errors)}"
+        )
+
+    bom_document = json.loads(bom_data)
+
+    # Extract the signature from the BOM metadata
+    signature_value = get_bom_property(
+        bom_document, BOM_SIGNATURE_PROPERTY)
+    if not signature_value:
+        raise HTTPException(
+            status_code=400, detail="BOM signature not found in metadata.")
+
+    # Decode the signature from Base64
+    signature_bytes = base64.b64decode(signature_value)
+
+    if get_bom_property(bom_document, BOM_SIGNATURE_SCHEME_PROPERTY) == JCS_SIGNATURE_SCHEME:
+        # Signed bytes are the canonical JSON of the document without its signature property
+        signed_bytes = bom_signing_payload(bom_document)
+    else:
+        # Legacy BOMs are signed over the library's serialization, rebuild it from the model
+        bom = Bom.from_json(bom_document)
+
+        # Remove the BOM Signature property and timestamp for verification
+        bom.metadata.properties = [
+            prop for prop in bom.metadata.properties if prop.name != BOM_SIGNATURE_PROPERTY
+        ]
+        bom.metadata.timestamp = None
+
+        # Serialize the BOM to JSON (excluding the BOM Signature property)
+        json_outputter = JsonV1Dot6(bom)
+        signed_bytes = json_outputter.output_as_string(
+            indent=4).encode("utf-8")
+
+    # Verify the BOM signature with the worker's cached Ed25519 public key
+    try:
+        verification_context.worker_public_key.verify(
+            signature_bytes, signed_bytes)
+    except InvalidSignature:
+        raise HTTPException(
+            status_code=400, detail="BOM signature verification failed.")
+
+    # Extract the .link file reference from the BOM
+    link_reference = next(
+        (ref.get("url") for ref in bom_document.get("externalReferences", [])
+         if ref.get("type") == "attestation" and ref.get("comment") == "in-toto .link file for artifact integrity verification"),
+        None
+    )
+    if not link_reference:
+        raise HTTPException(
+            status_code=400, detail="No .link file reference found in BOM.")
+    return link_reference
+
+
+def verify_link_data(link_data: bytes):
+    """Verify an in-toto .link file, given as JSON, against the signed layout."""
+    verify_link_metadata(Metablock.from_dict(
+        json.loads(link_data)), verification_context)
+
+
+def verify_link_reference(link_reference: str):
+    """Fetch an in-toto .link file from MinIO straight into memory and verify it against the signed layout."""
+    link_data = get_json_from_minio(link_reference, TRAINING_BUCKET)
+    verify_link_metadata(Metablock.from_dict(link_data), verification_context)
+
+
+def verify_link_metadata(link_metadata: Metablock, context: VerificationContext):
+    """
+    Verify in-toto link metadata against the signed layout of the verification context.
+    The link is written to a temporary directory of its own, under the filenames in-toto looks for
+    (one per authorized key that signed it), so links of other requests are never picked up.
+    """
+    layout_metadata = context.layout
+    layout = layout_metadata.signed
+    link = link_metadata.signed
+    if link.type_ != "link":
+        raise HTTPException(
+            status_code=400, detail="Expected in-toto link metadata, sublayouts are not supported.")
+    signing_keyids = {signature["keyid"] if isinstance(signature, dict) else signature.keyid
+                      for signature in link_metadata.signatures}
+
+    with tempfile.TemporaryDirectory() as link_dir:
+        # Only filenames derived from the layout are written, the link's own name never becomes a path
+        for step in layout.steps:
+            if step.name != link.name:
+                continue
+            for authorized_keyid in step.pubkeys:
+                for keyid in [authorized_keyid] + list(
+                        layout.keys.get(authorized_keyid, {}).get("subkeys", {}).keys()):
+                    if keyid in signing_keyids:
+                        link_metadata.dump(os.path.join(
+                            link_dir, FILENAME_FORMAT.format(step_name=step.name, keyid=keyid)))
+
+        # Inspection links are not written, they only feed the inspection rules
+        in_toto_verify(
+            metadata=layout_metadata,
+            layout_key_dict=layout.keys,
+            link_dir_path=link_dir,
+            persist_inspection_links=False,
+        )
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, UploadFile, HTTPException, File
+from fastapi import APIRouter, Depends, UploadFile, HTTPException, File, Form
+from typing import List, Optional
 import os
 import json
-import base64
-import shutil
-from fastapi.responses import JSONResponse
+import time
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from in_toto.models.metadata import Metablock
-from in_toto.verifylib import in_toto_verify
 from in_toto.exceptions import (
     SignatureVerificationError,
     LayoutExpiredError,
@@ -13,51 +16,54 @@ from in_toto.exceptions import (
     ThresholdVerificationError,
     RuleVerificationError,
 )
-from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
-from cryptography.exceptions import InvalidSignature
-from cyclonedx.model.bom import Bom
-from cyclonedx.validation.json import JsonStrictValidator
-from cyclonedx.schema import SchemaVersion
-from cyclonedx.output.json import JsonV1Dot6
-from shared.minio_utils import download_file_from_minio, TRAINING_BUCKET
-from shared.in_toto_utils import record_artifact_as_dict
+from shared.minio_utils import get_object_from_minio, hash_object_in_minio, TRAINING_BUCKET
+from shared.in_toto_utils import hash_fileobj
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import Job
+from verification_context import VerificationContext, get_verification_context
+from verification_stages import run_verification_stage, check_bom, verify_link_data, verify_link_reference
 
 # === Router Setup ===
 verifier_router = APIRouter(prefix="/verifier", tags=["Verifier Endpoints"])
 
+# Artifacts hashed at the same time by verify_minio_artifacts
+VERIFY_MAX_PARALLEL_ARTIFACTS = int(
+    os.getenv("VERIFY_MAX_PARALLEL_ARTIFACTS", 8))
+# Items verified at the same time by verify_bom_and_link_batch, and the largest accepted batch
+VERIFY_BATCH_MAX_WORKERS = int(os.getenv("VERIFY_BATCH_MAX_WORKERS", 8))
+VERIFY_BATCH_MAX_ITEMS = int(os.getenv("VERIFY_BATCH_MAX_ITEMS", 500))
+
+# Guards the .link outcomes shared by the items of a batch
+_link_results_lock = threading.Lock()
+
+# === Database Dependency ===
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
 # === Verifier Endpoints ===
 
 
 @verifier_router.post("/verify_in-toto_link")
-async def verify_in_toto(
+def verify_in_toto(
     link_file: UploadFile = File(
         ..., description="In-toto link file (e.g., run_training.<keyid>.link)"),
+    context: VerificationContext = Depends(get_verification_context),
 ):
     try:
-        # Save the uploaded link file temporarily
-        temp_dir = "/tmp/verify"
-        link_path = save_uploaded_file(link_file, temp_dir)
-
         # --- Enforce correct .link filename ---
-        # Load the layout to get expected step names and keyids
-        layout_path = "/run/secrets/signed_layout"
-        layout_metadata = Metablock.load(layout_path)
-        expected_filenames = []
-        for step in layout_metadata.signed.steps:
-            for keyid in layout_metadata.signed.keys.keys():
-                expected_filenames.append(f"{step.name}.{keyid[:8]}.link")
-
-        # Try to match the uploaded file to one of the expected filenames
-        matched = False
-        for expected_filename in expected_filenames:
-            # allow for keyid length >8
-            if link_file.filename.startswith(expected_filename[:-5]):
-                # Rename the file to the exact expected filename
-                correct_path = os.path.join(temp_dir, expected_filename)
-                shutil.move(link_path, correct_path)
-                link_path = correct_path
-                matched = True
-                break
+        # Expected step names and keyids come from the cached layout
+        expected_filenames = context.expected_link_filenames
+
+        # allow for keyid length >8
+        matched = any(link_file.filename.startswith(expected_filename[:-5])
+                      for expected_filename in expected_filenames)
 
         if not matched:
             raise HTTPException(
@@ -66,8 +72,8 @@ async def verify_in_toto(
             )
         # --- End enforce filename ---
 
-        # Use the helper function to verify the .link file
-        verify_link_file(link_path, temp_dir)
+        # Verify the uploaded link file in the verification process pool
+        run_verification_stage(verify_link_data, data=link_file.file.read())
 
         return {
             "status": "success",
@@ -102,7 +108,7 @@ async def verify_in_toto(
 
 
 @verifier_router.post("/verify_file_hash")
-async def verify_file_hash(
+def verify_file_hash(
     link_file: UploadFile = File(
         ..., description="In-toto link file (e.g., run_training.<keyid>.link)"),
     uploaded_file: UploadFile = File(
@@ -112,16 +118,12 @@ async def verify_file_hash(
     Verify the hash of an uploaded file against the in-toto link file metadata.
     """
     try:
-        # Save the uploaded files temporarily
-        temp_dir = "/tmp/verify"
-        link_path = save_uploaded_file(link_file, temp_dir)
-        file_to_verify_path = save_uploaded_file(uploaded_file, temp_dir)
-
         # Load the link file
-        link_metadata = Metablock.load(link_path)
+        link_metadata = load_uploaded_link(link_file)
 
-        # Compute the hash of the uploaded file
-        computed_hash = record_artifact_as_dict(file_to_verify_path)
+        # Hash the uploaded file chunk by chunk
+        digest, _ = hash_fileobj(uploaded_file.file)
+        computed_hash = {"sha256": digest}
 
         # Check if the hash matches any material or product in the link file
         recorded_hash = None
@@ -163,7 +165,7 @@ async def verify_file_hash(
 
 
 @verifier_router.post("/verify_minio_artifacts")
-async def verify_minio_artifacts(
+def verify_minio_artifacts(
     link_file: UploadFile = File(
         ..., description="In-toto link file (e.g., run_training.<keyid>.link)"),
 ):
@@ -172,85 +174,53 @@ async def verify_minio_artifacts(
     If this has mismatches, this means that the artifacts in MinIO are not the same as those recorded in the link file.
     This could be due to a malicious actor that has access to MinIO tampering with the files.
     Because the link file is signed, the malicious actor cannot change the link file itself to match the tampered files.
+    Artifacts are hashed concurrently straight from their MinIO object streams, nothing is written to disk.
     """
     try:
-        # Save the uploaded link file temporarily
-        temp_dir = "/tmp/verify"
-        link_path = save_uploaded_file(link_file, temp_dir)
-
         # Load the link file
-        link_metadata = Metablock.load(link_path)
+        link_metadata = load_uploaded_link(link_file)
 
         # Prepare to store verification results
         mismatched_materials = []
         mismatched_products = []
         verified_materials = []
         verified_products = []
+        timings = {}
 
-        # Extract unique_dir dynamically from the first material or product path
         all_paths = list(link_metadata.signed.materials.keys()) + \
             list(link_metadata.signed.products.keys())
         if not all_paths:
             raise HTTPException(
                 status_code=400, detail="No materials or products found in the link file.")
 
-        # Assume the unique_dir is the first part of the path (e.g., "2809d3f5-72d8-4097-932c-401f3433c255")
-        unique_dir = all_paths[0].split("/")[0]
-
-        # Verify materials
-        for material_path, recorded_hash in link_metadata.signed.materials.items():
-            minio_path = material_path  # Full path already includes unique_dir
-            local_path = os.path.join(
-                temp_dir, os.path.basename(material_path))
-
-            # Download material from MinIO
-            try:
-                download_file_from_minio(
-                    minio_path, local_path, TRAINING_BUCKET)
-            except Exception as e:
-                mismatched_materials.append({
-                    "path": material_path,
-                    "error": f"Failed to download from MinIO: {str(e)}"
-                })
-                continue
-
-            # Compute hash and compare
-            computed_hash = record_artifact_as_dict(local_path)
-            if computed_hash != recorded_hash:
-                mismatched_materials.append({
-                    "path": material_path,
-                    "computed_hash": computed_hash,
-                    "recorded_hash": recorded_hash,
+        # Full paths already include the unique_dir of the job
+        artifacts = [("material", path, recorded_hash) for path, recorded_hash in link_metadata.signed.materials.items()] + \
+            [("product", path, recorded_hash)
+             for path, recorded_hash in link_metadata.signed.products.items()]
+
+        start_time = time.perf_counter()
+        results = verify_minio_artifact_hashes(artifacts)
+        total_seconds = time.perf_counter() - start_time
+
+        for (kind, path, recorded_hash), result in zip(artifacts, results):
+            verified = verified_materials if kind == "material" else verified_products
+            mismatched = mismatched_materials if kind == "material" else mismatched_products
+            timings[path] = {"seconds": result["seconds"],
+                             "size": result.get("size")}
+
+            if "error" in result:
+                mismatched.append({
+                    "path": path,
+                    "error": f"Failed to hash in MinIO: {result['error']}"
                 })
-            else:
-                verified_materials.append(material_path)
-
-        # Verify products
-        for product_path, recorded_hash in link_metadata.signed.products.items():
-            minio_path = product_path  # Full path already includes unique_dir
-            local_path = os.path.join(temp_dir, os.path.basename(product_path))
-
-            # Download product from MinIO
-            try:
-                download_file_from_minio(
-                    minio_path, local_path, TRAINING_BUCKET)
-            except Exception as e:
-                mismatched_products.append({
-                    "path": product_path,
-                    "error": f"Failed to download from MinIO: {str(e)}"
-                })
-                continue
-
-            # Compute hash and compare
-            computed_hash = record_artifact_as_dict(local_path)
-            if computed_hash != recorded_hash:
-                mismatched_products.append({
-                    "path": product_path,
-                    "computed_hash": computed_hash,
+            elif result["computed_hash"] != recorded_hash:
+                mismatched.append({
+                    "path": path,
+                    "computed_hash": result["computed_hash"],
                     "recorded_hash": recorded_hash,
                 })
             else:
-                verified_products.append(product_path)
+                verified.append(path)
 
         # Prepare response
         response = {
@@ -259,6 +229,8 @@ async def verify_minio_artifacts(
             "verified_products": verified_products,
             "mismatched_materials": mismatched_materials,
             "mismatched_products": mismatched_products,
+            "timings": timings,
+            "total_seconds": total_seconds,
         }
 
         return response
@@ -269,98 +241,15 @@ async def verify_minio_artifacts(
 
 
 @verifier_router.post("/verify_bom_and_link")
-async def verify_bom_and_link(
+def verify_bom_and_link(
     bom_file: UploadFile = File(...,
                                 description="A signed CycloneDX BOM file (JSON format)."),
 ):
     try:
-        # Save the BOM file
-        temp_dir = "/tmp/verify"
-        bom_path = save_uploaded_file(bom_file, temp_dir)
-
         # Load the BOM file content
-        with open(bom_path, "r") as f:
-            bom_data = f.read()
-
-        # Validate the BOM against the CycloneDX schema
-        validator = JsonStrictValidator(SchemaVersion.V1_6)
-        validation_errors = validator.validate_str(bom_data)
-        if validation_errors:
-            raise HTTPException(
-                status_code=400,
-                detail=f"BOM validation failed: {repr(validation_errors)}"
-            )
+        bom_data = bom_file.file.read()
 
-        # Deserialize the BOM to extract the signature and serialized content
-        bom = Bom.from_json(json.loads(bom_data))
-
-        # Extract the signature from the BOM metadata
-        signature_property = next(
-            (prop for prop in bom.metadata.properties if prop.name ==
-             "BOM Signature"), None
-        )
-        if not signature_property:
-            raise HTTPException(
-                status_code=400, detail="BOM signature not found in metadata.")
-
-        # Decode the signature from Base64
-        signature_bytes = base64.b64decode(signature_property.value)
-
-        # Remove the BOM Signature property and timestamp for verification
-        bom.metadata.properties = [
-            prop for prop in bom.metadata.properties if prop.name != "BOM Signature"
-        ]
-        bom.metadata.timestamp = None
-
-        # Serialize the BOM to JSON (excluding the BOM Signature property)
-        json_outputter = JsonV1Dot6(bom)
-        serialized_bom = json_outputter.output_as_string(indent=4)
-
-        # Load the worker's public key
-        public_key_bytes = load_worker_public_key()
-
-        # Verify the BOM signature using cryptography's Ed25519 module
-        try:
-            public_key = Ed25519PublicKey.from_public_bytes(public_key_bytes)
-            public_key.verify(signature_bytes, serialized_bom.encode("utf-8"))
-        except InvalidSignature:
-            raise HTTPException(
-                status_code=400, detail="BOM signature verification failed.")
-
-        # Extract the .link file reference from the BOM
-        link_reference = next(
-            (str(ref.url) for ref in bom.external_references
-             if ref.type == "attestation" and ref.comment == "in-toto .link file for artifact integrity verification"),
-            None
-        )
-        if not link_reference:
-            raise HTTPException(
-                status_code=400, detail="No .link file reference found in BOM.")
-
-        # Verify the .link file
-        link_path = os.path.join(temp_dir, os.path.basename(link_reference))
-        download_file_from_minio(link_reference, link_path, TRAINING_BUCKET)
-
-        try:
-            verify_link_file(link_path, temp_dir)
-        except SignatureVerificationError:
-            raise HTTPException(
-                status_code=400, detail="Verification failed: Invalid signature on the layout or link file.")
-        except LayoutExpiredError:
-            raise HTTPException(
-                status_code=400, detail="Verification failed: The layout has expired.")
-        except LinkNotFoundError:
-            raise HTTPException(
-                status_code=400, detail="Verification failed: No valid link files found for the step.")
-        except ThresholdVerificationError:
-            raise HTTPException(
-                status_code=400, detail="Verification failed: Threshold requirements not met for the step.")
-        except RuleVerificationError as e:
-            raise HTTPException(
-                status_code=400, detail=f"Verification failed: Artifact rule violation. {str(e)}")
-        except Exception as e:
-            raise HTTPException(
-                status_code=400, detail=f"Verification failed during .link file verification: {str(e)}")
+        verify_bom_data(bom_data)
 
         return JSONResponse(
             content={
@@ -378,61 +267,212 @@ async def verify_bom_and_link(
             status_code=400, detail=f"Verification failed: {str(e)}")
 
 
-def verify_link_file(link_path: str, temp_dir: str):
+@verifier_router.post("/verify_bom_and_link_batch")
+async def verify_bom_and_link_batch(
+    bom_files: Optional[List[UploadFile]] = File(
+        None, description="Signed CycloneDX BOM files (JSON format)."),
+    job_ids: Optional[List[str]] = Form(
+        None, description="IDs of jobs whose BOM is verified from MinIO."),
+    db: Session = Depends(get_db),
+):
     """
-    Helper function to verify an in-toto .link file against the signed layout.
+    Verify many BOMs and their .link files at once.
+    Items are verified concurrently on a bounded pool, every .link file is verified once per batch,
+    and the per-item results are streamed back as NDJSON in the order they complete.
     """
-    # Path to the signed layout file (assumed to be in /run/secrets)
-    layout_path = "/run/secrets/signed_layout"
+    # Reading the uploads and querying the jobs block, so they run in the thread pool
+    items = await run_in_threadpool(collect_batch_items, bom_files, job_ids, db)
 
-    # Check if the signed layout file exists
-    if not os.path.exists(layout_path):
+    if not items:
         raise HTTPException(
-            status_code=500,
-            detail="The signed layout file does not exist. Please ensure it is available at '/run/secrets/signed_layout'.",
-        )
+            status_code=400, detail="Provide at least one BOM file or job ID.")
+    if len(items) > VERIFY_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400, detail=f"A batch can contain at most {VERIFY_BATCH_MAX_ITEMS} items.")
+
+    # Outcome per .link reference, shared by all items of this batch
+    link_results = {}
 
-    # Load the signed layout and the .link file
-    layout_metadata = Metablock.load(layout_path)
-    link_metadata = Metablock.load(link_path)
+    async def stream_results():
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(
+            max_workers=min(VERIFY_BATCH_MAX_WORKERS, len(items)))
+        try:
+            futures = [loop.run_in_executor(executor, verify_batch_item, index, item, link_results)
+                       for index, item in enumerate(items)]
+            for future in asyncio.as_completed(futures):
+                yield json.dumps(await future) + "\n"
+        finally:
+            # Never wait on the event loop, e.g. for items still queued after the client disconnected
+            executor.shutdown(wait=False, cancel_futures=True)
 
-    # Verify the .link file
-    in_toto_verify(
-        metadata=layout_metadata,
-        layout_key_dict=layout_metadata.signed.keys,
-        link_dir_path=temp_dir,
-    )
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
 
 
-def load_worker_public_key(worker_public_key_path: str = "/run/secrets/worker_public_key") -> bytes:
+@verifier_router.get("/job_input_digests/{job_id}")
+def job_input_digests(job_id: str, db: Session = Depends(get_db)):
     """
-    Load and validate the worker's public key from a JSON file.
+    Return the input digests recorded when the job was submitted.
+    Verifiers can compare these with the materials of the job's .link file without downloading any blobs.
+    The route is public like the other verifier routes, so it only returns the digests (which the signed
+    BOM and .link file publish anyway), never where the job's files are stored.
     """
-    if not os.path.exists(worker_public_key_path):
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if not job.model_sha256:
         raise HTTPException(
-            status_code=500,
-            detail="Worker public key not found. Please ensure it is available at the specified path.",
-        )
+            status_code=404, detail="No input digests were recorded for this job.")
+
+    return {
+        "job_id": job_id,
+        "inputs": {
+            "model": {"sha256": job.model_sha256, "size": job.model_size},
+            "dataset": {"sha256": job.dataset_sha256, "size": job.dataset_size},
+            "dataset_definition": {
+                "sha256": job.dataset_definition_sha256,
+                "size": job.dataset_definition_size,
+            },
+        },
+    }
 
-    with open(worker_public_key_path, "r") as f:
-        public_key_data = json.load(f)
 
-    if public_key_data["keytype"] != "ed25519" or public_key_data["scheme"] != "ed25519":
-        raise HTTPException(
-            status_code=400,
-            detail="Invalid public key format. Expected Ed25519 key.",
-        )
+def verify_bom_data(bom_data: bytes, link_results: dict = None):
+    """
+    Verify a signed CycloneDX BOM: its schema, its signature and the in-toto .link file it references.
+    Both checks run in the verification process pool.
+
+    Args:
+        bom_data (bytes): The BOM as JSON.
+        link_results (dict, optional): Future outcome per .link reference, shared by the items of a batch.
+
+    Raises:
+        HTTPException: If any of the checks fails.
+    """
+    link_reference = run_verification_stage(check_bom, data=bom_data)
+
+    # Links shared by several BOMs of a batch are verified once, other items wait for that outcome
+    link_outcome = None
+    if link_results is not None:
+        with _link_results_lock:
+            pending = link_results.get(link_reference)
+            if pending is None:
+                link_outcome = link_results[link_reference] = Future()
+        if pending is not None:
+            link_error = pending.result()
+            if link_error:
+                raise link_error
+            return
+
+    link_error = None
+    try:
+        # The pool process fetches the .link file straight into memory and verifies it
+        run_verification_stage(verify_link_reference, link_reference)
+    except SignatureVerificationError:
+        link_error = HTTPException(
+            status_code=400, detail="Verification failed: Invalid signature on the layout or link file.")
+    except LayoutExpiredError:
+        link_error = HTTPException(
+            status_code=400, detail="Verification failed: The layout has expired.")
+    except LinkNotFoundError:
+        link_error = HTTPException(
+            status_code=400, detail="Verification failed: No valid link files found for the step.")
+    except ThresholdVerificationError:
+        link_error = HTTPException(
+            status_code=400, detail="Verification failed: Threshold requirements not met for the step.")
+    except RuleVerificationError as e:
+        link_error = HTTPException(
+            status_code=400, detail=f"Verification failed: Artifact rule violation. {str(e)}")
+    except Exception as e:
+        link_error = HTTPException(
+            status_code=400, detail=f"Verification failed during .link file verification: {str(e)}")
+
+    if link_outcome is not None:
+        link_outcome.set_result(link_error)
+    if link_error:
+        raise link_error
+
+
+def collect_batch_items(bom_files: list, job_ids: list, db: Session) -> list:
+    """
+    Build the items of a batch: uploaded BOMs with their content, job IDs with the MinIO object of their BOM.
+    """
+    items = []
+    for bom_file in bom_files or []:
+        items.append({"file_name": bom_file.filename,
+                     "bom_data": bom_file.file.read()})
+    for job_id in job_ids or []:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        items.append({"job_id": job_id,
+                     "bom_object": f"{job.unique_dir}/output/cyclonedx_bom.json" if job else None})
+    return items
+
+
+def verify_batch_item(index: int, item: dict, link_results: dict) -> dict:
+    """
+    Verify one item of a batch and return its result line instead of raising.
+    """
+    result = {"index": index}
+    result.update({key: item[key]
+                  for key in ("file_name", "job_id") if key in item})
+    start_time = time.perf_counter()
+    try:
+        if "job_id" in item:
+            if not item["bom_object"]:
+                raise HTTPException(status_code=404, detail="Job not found.")
+            # The stored bytes are verified as-is, re-serializing them could change what was signed
+            bom_data = get_object_from_minio(
+                item["bom_object"], TRAINING_BUCKET)
+        else:
+            bom_data = item["bom_data"]
+
+        verify_bom_data(bom_data, link_results)
+        result.update({"status": "success",
+                      "message": "BOM and .link file verification successful."})
+    except HTTPException as e:
+        result.update({"status": "failure", "detail": e.detail})
+    except Exception as e:
+        result.update({"status": "failure",
+                      "detail": f"Verification failed: {str(e)}"})
+    result["seconds"] = time.perf_counter() - start_time
+    return result
+
 
-    public_key_hex = public_key_data["keyval"]["public"]
-    return bytes.fromhex(public_key_hex)
+def hash_minio_artifact(path: str) -> dict:
+    """
+    Hash one artifact of a job straight from its MinIO object stream and time it.
+    Errors are returned in the result so that one missing artifact does not stop the others.
+    """
+    start_time = time.perf_counter()
+    try:
+        digest, size = hash_object_in_minio(path, TRAINING_BUCKET)
+        return {
+            "computed_hash": {"sha256": digest},
+            "size": size,
+            "seconds": time.perf_counter() - start_time,
+        }
+    except Exception as e:
+        return {"error": str(e), "seconds": time.perf_counter() - start_time}
+
+
+def verify_minio_artifact_hashes(artifacts: list) -> list:
+    """
+    Hash the artifacts of a link file concurrently, at most VERIFY_MAX_PARALLEL_ARTIFACTS at a time.
+
+    Args:
+        artifacts (list): Tuples of (kind, path, recorded_hash).
+
+    Returns:
+        list: The hash_minio_artifact results, in the order of artifacts.
+    """
+    if len(artifacts) <= 1:
+        return [hash_minio_artifact(path) for _, path, _ in artifacts]
+    with ThreadPoolExecutor(max_workers=min(VERIFY_MAX_PARALLEL_ARTIFACTS, len(artifacts))) as executor:
+        return list(executor.map(hash_minio_artifact, [path for _, path, _ in artifacts]))
 
 
-def save_uploaded_file(uploaded_file: UploadFile, temp_dir: str) -> str:
+def load_uploaded_link(uploaded_file: UploadFile) -> Metablock:
     """
-    Save an uploaded file to a temporary directory and return its path.
+    Parse an uploaded in-toto .link file in memory.
     """
-    os.makedirs(temp_dir, exist_ok=True)
-    file_path = os.path.join(temp_dir, uploaded_file.filename)
-    with open(file_path, "wb") as f:
-        f.write(uploaded_file.file.read())
-    return file_path
+    return Metablock.from_dict(json.load(uploaded_file.file))
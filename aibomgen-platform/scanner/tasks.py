@@ -1,11 +1,16 @@
-from shared.minio_utils import upload_file_to_minio, create_bucket_if_not_exists, WORKER_SCANS_BUCKET, SCANNER_SCANS_BUCKET
+from shared.minio_utils import upload_file_to_minio, upload_json_to_minio, get_json_from_minio, create_bucket_if_not_exists, WORKER_SCANS_BUCKET, SCANNER_SCANS_BUCKET, LATEST_SCAN_SUMMARY_NAME
 import subprocess
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import docker
 from celery_config import celery_app
 
+TRIVY_IMAGE = "aquasec/trivy:latest"
+# Named Docker volume holding the Trivy vulnerability DB, kept warm between scans
+TRIVY_CACHE_VOLUME = os.getenv("TRIVY_CACHE_VOLUME", "aibomgen-trivy-cache")
+
 
 def get_docker_info():
     """
@@ -27,6 +32,64 @@ def get_docker_info():
         return {"error": f"Error retrieving Docker info: {str(e)}"}
 
 
+def run_trivy(*args):
+    """
+    Run a Trivy command in a Trivy container with access to the Docker daemon and the shared DB cache.
+    Returns the standard output of the command.
+    """
+    trivy_result = subprocess.run(
+        [
+            "docker", "run", "--rm",
+            "-v", "/var/run/docker.sock:/var/run/docker.sock",
+            "-v", f"{TRIVY_CACHE_VOLUME}:/root/.cache/",
+            TRIVY_IMAGE, *args
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if trivy_result.returncode != 0:
+        raise Exception(
+            f"Trivy command {' '.join(args[:2])} failed: {trivy_result.stderr.strip()}")
+    return trivy_result.stdout
+
+
+def update_vulnerability_db():
+    """
+    Download the Trivy vulnerability DB into the cache volume if it is outdated.
+    Returns the UpdatedAt timestamp of the DB, which identifies its version.
+    """
+    run_trivy("image", "--download-db-only")
+    version_info = json.loads(run_trivy("version", "--format", "json"))
+    return version_info.get("VulnerabilityDB", {}).get("UpdatedAt", "Unknown")
+
+
+def get_image_id(image_name):
+    """Return the ID (content digest) of a local Docker image."""
+    return docker.from_env().images.get(image_name).id
+
+
+def get_latest_scan_summary(bucket_name, bucket_prefix):
+    """Return the published summary of the latest scan under bucket_prefix, or None if there is none."""
+    try:
+        return get_json_from_minio(
+            f"{bucket_prefix}/{LATEST_SCAN_SUMMARY_NAME}", bucket_name)
+    except Exception:
+        return None
+
+
+def summarize_vulnerabilities(vulnerabilities):
+    """
+    Count the vulnerabilities of a Trivy JSON report by severity.
+    """
+    summary = {}
+    for result in vulnerabilities.get("Results", []):
+        for vuln in result.get("Vulnerabilities", None) or []:
+            severity = vuln.get("Severity", "UNKNOWN")
+            summary[severity] = summary.get(severity, 0) + 1
+    return summary
+
+
 @celery_app.task(name="tasks.scan_worker_and_self_images")
 def scan_worker_and_self_images():
     """
@@ -51,50 +114,67 @@ def scan_worker_and_self_images():
         if not scanner_image_name or scanner_image_name == "Unknown":
             raise ValueError("Scanner image name could not be determined.")
 
+        # Refresh the vulnerability DB once, both scans then run with --skip-db-update
+        db_updated_at = update_vulnerability_db()
+
         # Helper function to perform the scan
         def perform_scan(image_name, bucket_name, bucket_prefix):
+            image_id = get_image_id(image_name)
+
+            # Skip the scan if neither the image nor the vulnerability DB changed since the last one
+            latest_summary = get_latest_scan_summary(bucket_name, bucket_prefix)
+            if latest_summary and latest_summary.get("image_id") == image_id and latest_summary.get("db_updated_at") == db_updated_at:
+                return f"{image_name}: unchanged, scan skipped"
+
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             output_file = f"/tmp/{image_name.replace(':', '_')}_vulnerabilities_{timestamp}.json"
 
-            network_name = "internal_network"  # The network name to use for the scan
-            # Unique container name for the scan
-            container_name = f"trivy_scanner_{timestamp}"
-
-            # Run Trivy scan in Trivy container
-            trivy_result = subprocess.run(
-                [
-                    "docker", "run", "--rm",
-                    "-v", "/var/run/docker.sock:/var/run/docker.sock",
-                    "-v", f"{os.path.expanduser('~')}/.cache/trivy:/root/.cache/",
-                    "aquasec/trivy:latest", "image", "--scanners", "vuln", "--format", "json", image_name
-                ],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-            )
-            if trivy_result.returncode != 0:
-                raise Exception(
-                    f"Trivy scan failed for {image_name}: {trivy_result.stderr.strip()}")
+            # Run Trivy scan in Trivy container. The layer cache is kept in memory, so concurrent
+            # scans do not contend for the lock on the cache volume's layer DB.
+            vulnerabilities = json.loads(run_trivy(
+                "image", "--scanners", "vuln", "--format", "json",
+                "--skip-db-update", "--cache-backend", "memory", image_name))
 
             # Save results to a file
-            vulnerabilities = json.loads(trivy_result.stdout)
             with open(output_file, "w") as f:
                 json.dump(vulnerabilities, f, indent=4)
 
             # Upload to MinIO
+            scan_object_name = f"{bucket_prefix}/{os.path.basename(output_file)}"
             upload_file_to_minio(
                 file_path=output_file,
-                object_name=f"{bucket_prefix}/{os.path.basename(output_file)}",
+                object_name=scan_object_name,
+                bucket_name=bucket_name,
+            )
+            os.remove(output_file)
+
+            # Publish the summary under a stable name once the full report is uploaded,
+            # so consumers never have to list the prefix or download the report
+            upload_json_to_minio(
+                {
+                    "image_name": image_name,
+                    "image_id": image_id,
+                    "db_updated_at": db_updated_at,
+                    "scanned_at": timestamp,
+                    "scan_object": scan_object_name,
+                    "severity_counts": summarize_vulnerabilities(vulnerabilities),
+                },
+                object_name=f"{bucket_prefix}/{LATEST_SCAN_SUMMARY_NAME}",
                 bucket_name=bucket_name,
             )
+            return f"{image_name}: scanned"
 
-        # Perform scans for both images
-        perform_scan(worker_image_name, WORKER_SCANS_BUCKET,
-                     "worker-vulnerability-scans")
-        perform_scan(scanner_image_name, SCANNER_SCANS_BUCKET,
-                     "scanner-vulnerability-scans")
+        # Perform scans for both images concurrently
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            scans = [
+                executor.submit(perform_scan, worker_image_name,
+                                WORKER_SCANS_BUCKET, "worker-vulnerability-scans"),
+                executor.submit(perform_scan, scanner_image_name,
+                                SCANNER_SCANS_BUCKET, "scanner-vulnerability-scans"),
+            ]
+            results = [scan.result() for scan in scans]
 
-        return {"status": "success", "message": "Both images scanned and results uploaded to MinIO."}
+        return {"status": "success", "message": "; ".join(results)}
 
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -0,0 +1,259 @@
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+# Worker-local, content-addressed cache for objects downloaded from MinIO.
+# Disabled unless ARTIFACT_CACHE_DIR is set (only the worker sets it).
+ARTIFACT_CACHE_DIR = os.getenv("ARTIFACT_CACHE_DIR")
+ARTIFACT_CACHE_MAX_BYTES = int(
+    os.getenv("ARTIFACT_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024))  # 2 GB
+# Staging files not written to for this long belong to downloads that died (e.g. an OOM-killed worker)
+ARTIFACT_CACHE_STAGING_MAX_AGE = int(
+    os.getenv("ARTIFACT_CACHE_STAGING_MAX_AGE", 3600))  # in seconds
+
+# ioctl request number for FICLONE (reflink) on Linux
+FICLONE = 0x40049409
+
+
+class HashingWriter:
+    """
+    Write-only file wrapper that computes the SHA-256 of everything written to it.
+    It deliberately exposes no seek/tell, so boto3 streams the object in order.
+    """
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self._hash.update(data)
+        self.size += len(data)
+        return self._fileobj.write(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+def is_cache_enabled():
+    """Return True if the artifact cache is configured for this process."""
+    return bool(ARTIFACT_CACHE_DIR)
+
+
+def _cache_subdir(name):
+    path = os.path.join(ARTIFACT_CACHE_DIR, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+@contextlib.contextmanager
+def _file_lock(lock_path):
+    """Hold an exclusive flock on lock_path, shared by every process using the cache."""
+    with open(lock_path, "a") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _ref_name(bucket_name, object_name, etag):
+    """Name of the ref file mapping a specific object version to its sha256."""
+    return hashlib.sha256(f"{bucket_name}\0{object_name}\0{etag}".encode()).hexdigest()
+
+
+def _read_ref(ref_path):
+    try:
+        with open(ref_path, "r") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _write_atomically(path, content):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _mark_used(blob_path):
+    """Record a cache hit by bumping atime only, so the blob's mtime stays stable."""
+    st = os.stat(blob_path)
+    os.utime(blob_path, ns=(time.time_ns(), st.st_mtime_ns))
+
+
+def _reflink(src_path, dest_path):
+    with open(src_path, "rb") as src, open(dest_path, "wb") as dest:
+        fcntl.ioctl(dest.fileno(), FICLONE, src.fileno())
+
+
+def _link_into_place(blob_path, dest_path):
+    """
+    Materialize a cached blob at dest_path without copying its bytes when possible:
+    hardlink first, reflink if the cache lives on another filesystem, copy as a last resort.
+    """
+    if os.path.lexists(dest_path):
+        os.remove(dest_path)
+    try:
+        os.link(blob_path, dest_path)
+        return
+    except OSError:
+        pass
+    try:
+        _reflink(blob_path, dest_path)
+        return
+    except OSError:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+    shutil.copyfile(blob_path, dest_path)
+
+
+def _sweep_stale_files(directory, max_age_seconds, suffix=""):
+    """Remove the files in directory (ending in suffix) that were last written more than max_age_seconds ago."""
+    cutoff_ns = time.time_ns() - max_age_seconds * 1_000_000_000
+    for name in os.listdir(directory):
+        if not name.endswith(suffix):
+            continue
+        path = os.path.join(directory, name)
+        with contextlib.suppress(FileNotFoundError):
+            if os.stat(path).st_mtime_ns < cutoff_ns:
+                os.remove(path)
+
+
+def _sweep_dangling_refs(refs_dir, objects_dir):
+    """Remove the refs whose blob no longer exists (evicted, or never stored)."""
+    for name in os.listdir(refs_dir):
+        if name.endswith(".tmp"):
+            continue
+        ref_path = os.path.join(refs_dir, name)
+        digest = _read_ref(ref_path)
+        if digest and os.path.exists(os.path.join(objects_dir, digest)):
+            continue
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(ref_path)
+
+
+def _evict(max_bytes, keep=None):
+    """
+    Evict least recently used blobs until the cache fits in max_bytes.
+    Also removes what crashed processes left behind (partial downloads in staging/,
+    unfinished ref writes) and refs that point to evicted blobs.
+    """
+    objects_dir = _cache_subdir("objects")
+    refs_dir = _cache_subdir("refs")
+    staging_dir = _cache_subdir("staging")
+    with _file_lock(os.path.join(ARTIFACT_CACHE_DIR, ".evict.lock")):
+        # Downloads in progress keep writing to their staging file, so only dead ones are this old
+        _sweep_stale_files(staging_dir, ARTIFACT_CACHE_STAGING_MAX_AGE)
+        _sweep_stale_files(refs_dir, ARTIFACT_CACHE_STAGING_MAX_AGE, suffix=".tmp")
+
+        entries = []
+        total_size = 0
+        for name in os.listdir(objects_dir):
+            blob_path = os.path.join(objects_dir, name)
+            try:
+                st = os.stat(blob_path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_atime_ns, st.st_size, name, blob_path))
+            total_size += st.st_size
+
+        # Oldest access first; unlinking a blob never breaks job directories
+        # because they hold their own hardlink to the inode
+        for _, size, name, blob_path in sorted(entries):
+            if total_size <= max_bytes:
+                break
+            if name == keep:
+                continue
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(blob_path)
+            total_size -= size
+
+        _sweep_dangling_refs(refs_dir, objects_dir)
+
+
+def fetch_through_cache(bucket_name, object_name, etag, download_path, fetch, sha256=None):
+    """
+    Place an object at download_path, downloading it only if it is not cached yet.
+
+    Args:
+        bucket_name (str): Bucket the object lives in.
+        object_name (str): Key of the object.
+        etag (str): ETag of the object version being fetched.
+        download_path (str): Where the object should appear (e.g. inside the job directory).
+        fetch (callable): Called with a writable file object to stream the object into.
+        sha256 (str, optional): Expected sha256 of the object (e.g. from its metadata).
+            It is used to look the blob up directly and to check a fresh download.
+
+    Returns:
+        str: The sha256 hex digest of the object.
+    """
+    objects_dir = _cache_subdir("objects")
+    refs_dir = _cache_subdir("refs")
+    locks_dir = _cache_subdir("locks")
+    staging_dir = _cache_subdir("staging")
+
+    ref_name = _ref_name(bucket_name, object_name, etag)
+    ref_path = os.path.join(refs_dir, ref_name)
+
+    # Serialize misses on the same object so concurrent processes download it once
+    with _file_lock(os.path.join(locks_dir, f"{ref_name}.lock")):
+        digest = sha256 or _read_ref(ref_path)
+        if digest:
+            blob_path = os.path.join(objects_dir, digest)
+            try:
+                _mark_used(blob_path)
+                _link_into_place(blob_path, download_path)
+                return digest
+            except FileNotFoundError:
+                pass  # Blob was evicted, fall through to a fresh download
+
+        staging_path = os.path.join(staging_dir, uuid.uuid4().hex)
+        try:
+            with open(staging_path, "wb") as f:
+                writer = HashingWriter(f)
+                fetch(writer)
+            digest = writer.hexdigest()
+            if sha256 and digest != sha256:
+                raise ValueError(
+                    f"sha256 {digest} does not match the submitted digest {sha256}")
+            os.chmod(staging_path, 0o444)
+            blob_path = os.path.join(objects_dir, digest)
+            os.replace(staging_path, blob_path)
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(staging_path)
+
+        _write_atomically(ref_path, digest)
+        _link_into_place(blob_path, download_path)
+
+    _evict(ARTIFACT_CACHE_MAX_BYTES, keep=digest)
+    return digest
+
+
+def load_cached_json(namespace, key):
+    """
+    Return a small JSON document derived from cached artifacts (e.g. dataset statistics),
+    or None if it is not cached or the cache is disabled.
+    """
+    if not is_cache_enabled():
+        return None
+    try:
+        with open(os.path.join(_cache_subdir(namespace), f"{key}.json"), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def store_cached_json(namespace, key, data):
+    """Store a small JSON document in the cache, a no-op if the cache is disabled."""
+    if not is_cache_enabled():
+        return
+    _write_atomically(os.path.join(
+        _cache_subdir(namespace), f"{key}.json"), json.dumps(data))
@@ -0,0 +1,118 @@
+import json
+import math
+
+# Metadata properties carrying the BOM signature (CycloneDX has no signature field for this use)
+BOM_SIGNATURE_PROPERTY = "BOM Signature"
+BOM_SIGNATURE_SCHEME_PROPERTY = "BOM Signature Scheme"
+
+# Ed25519 over the RFC 8785 (JCS) canonical JSON of the BOM without its signature property
+JCS_SIGNATURE_SCHEME = "jcs-ed25519"
+
+# Integers up to this magnitude are exact as doubles and serialize as themselves
+MAX_SAFE_INTEGER = 2 ** 53
+
+
+def _canonical_number(value):
+    """Serialize a number like ECMAScript's Number.prototype.toString, as RFC 8785 requires."""
+    if isinstance(value, int):
+        if abs(value) <= MAX_SAFE_INTEGER:
+            return str(value)
+        # Larger integers are IEEE 754 doubles in ECMAScript, serialize the rounded value
+        try:
+            value = float(value)
+        except OverflowError:
+            raise ValueError("Integer is too large for canonical JSON.")
+    if not math.isfinite(value):
+        raise ValueError("NaN and Infinity are not allowed in canonical JSON.")
+    if value == 0:
+        return "0"
+
+    # repr gives the shortest digits that round-trip, only the notation differs from ECMAScript
+    sign = "-" if value < 0 else ""
+    mantissa, _, exponent = repr(abs(value)).partition("e")
+    integer_part, _, fraction_part = mantissa.partition(".")
+    all_digits = integer_part + fraction_part
+    digits = all_digits.lstrip("0")
+    # Position of the decimal point relative to the first significant digit
+    point = len(integer_part) + int(exponent or 0) - \
+        (len(all_digits) - len(digits))
+    digits = digits.rstrip("0")
+    count = len(digits)
+
+    if count <= point <= 21:
+        return sign + digits + "0" * (point - count)
+    if 0 < point <= 21:
+        return sign + digits[:point] + "." + digits[point:]
+    if -6 < point <= 0:
+        return sign + "0." + "0" * -point + digits
+    exponent = point - 1
+    return sign + digits[0] + ("." + digits[1:] if count > 1 else "") + \
+        "e" + ("+" if exponent >= 0 else "-") + str(abs(exponent))
+
+
+def _canonicalize(value, parts):
+    if value is None or isinstance(value, bool):
+        parts.append(json.dumps(value))
+    elif isinstance(value, (int, float)):
+        parts.append(_canonical_number(value))
+    elif isinstance(value, str):
+        # Only the escapes JSON requires, everything else as UTF-8
+        parts.append(json.dumps(value, ensure_ascii=False))
+    elif isinstance(value, (list, tuple)):
+        parts.append("[")
+        for i, item in enumerate(value):
+            if i:
+                parts.append(",")
+            _canonicalize(item, parts)
+        parts.append("]")
+    elif isinstance(value, dict):
+        parts.append("{")
+        # Members are sorted by the UTF-16 code units of their names
+        for i, key in enumerate(sorted(value, key=lambda k: k.encode("utf-16-be"))):
+            if i:
+                parts.append(",")
+            parts.append(json.dumps(key, ensure_ascii=False))
+            parts.append(":")
+            _canonicalize(value[key], parts)
+        parts.append("}")
+    else:
+        raise TypeError(
+            f"Type {type(value).__name__} is not allowed in canonical JSON.")
+
+
+def canonicalize_json(value):
+    """
+    Serialize a parsed JSON value to its RFC 8785 (JSON Canonicalization Scheme) form.
+
+    Args:
+        value: The JSON value (dicts, lists, strings, numbers, booleans and None).
+
+    Returns:
+        bytes: The canonical UTF-8 encoded JSON.
+    """
+    parts = []
+    _canonicalize(value, parts)
+    return "".join(parts).encode("utf-8")
+
+
+def get_bom_property(bom_document, name):
+    """Return the value of a metadata property of a parsed CycloneDX BOM, or None."""
+    for prop in bom_document.get("metadata", {}).get("properties", []):
+        if prop.get("name") == name:
+            return prop.get("value")
+    return None
+
+
+def bom_signing_payload(bom_document):
+    """
+    Return the bytes signed under JCS_SIGNATURE_SCHEME: the canonical JSON of the parsed BOM
+    without its signature property. The signature scheme property itself is signed.
+    """
+    metadata = dict(bom_document.get("metadata", {}))
+    metadata["properties"] = [
+        prop for prop in metadata.get("properties", [])
+        if prop.get("name") != BOM_SIGNATURE_PROPERTY
+    ]
+    if not metadata["properties"]:
+        del metadata["properties"]
+    return canonicalize_json({**bom_document, "metadata": metadata})
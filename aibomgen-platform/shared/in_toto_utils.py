@@ -5,6 +5,14 @@ from securesystemslib.signer._key import SSlibKey
 import json
 import hashlib
 import os
+import threading
+from shared.minio_utils import download_files_from_minio
+
+# Digests of local artifacts, keyed by (path, size, mtime) so a file that is
+# rewritten after hashing is never served a stale value
+_artifact_digests = {}
+_artifact_digests_lock = threading.Lock()
+MAX_MEMOIZED_DIGESTS = 1024
 
 def load_signer(private_key_path, public_key_path):
     """
@@ -27,9 +35,70 @@ def load_signer(private_key_path, public_key_path):
     return signer
 
 
+def _artifact_key(file_path):
+    st = os.stat(file_path)
+    return (os.path.realpath(file_path), st.st_size, st.st_mtime_ns)
+
+
+def _store_digest(key, sha256_hexdigest):
+    with _artifact_digests_lock:
+        _artifact_digests[key] = sha256_hexdigest
+        # Drop the oldest entries (dicts keep insertion order) to bound memory
+        while len(_artifact_digests) > MAX_MEMOIZED_DIGESTS:
+            del _artifact_digests[next(iter(_artifact_digests))]
+
+
+def remember_artifact_digest(file_path, sha256_hexdigest):
+    """
+    Memoize a digest that was computed elsewhere (e.g. while the file streamed from MinIO).
+
+    Args:
+        file_path (str): Path to the artifact file.
+        sha256_hexdigest (str): SHA256 hex digest of the file's content.
+    """
+    _store_digest(_artifact_key(file_path), sha256_hexdigest)
+
+
+def download_and_record_artifacts(downloads):
+    """
+    Download several artifacts from MinIO concurrently, memoizing the digests computed while they stream.
+
+    Args:
+        downloads (list): Tuples of (object_name, download_path, bucket_name).
+
+    Returns:
+        list: Dictionaries containing the hash of each artifact, in the order of downloads.
+    """
+    digests = download_files_from_minio(downloads)
+    for (_, download_path, _), digest in zip(downloads, digests):
+        remember_artifact_digest(download_path, digest)
+    return [{"sha256": digest} for digest in digests]
+
+
+def hash_fileobj(fileobj, chunk_size=1024 * 1024):
+    """
+    Compute the SHA256 and size of a binary file object in fixed-size chunks, then rewind it so it can be read again.
+
+    Args:
+        fileobj: A readable, seekable binary file object (e.g. an uploaded file).
+        chunk_size (int): Number of bytes read at a time.
+
+    Returns:
+        tuple: (sha256 hex digest, size in bytes).
+    """
+    hash_digest = hashlib.sha256()
+    size = 0
+    while chunk := fileobj.read(chunk_size):
+        hash_digest.update(chunk)
+        size += len(chunk)
+    fileobj.seek(0)
+    return hash_digest.hexdigest(), size
+
+
 def record_artifact_as_dict(file_path):
     """
     Record an artifact as a dictionary with its hash.
+    The file is only read if its digest is not memoized for its current size and mtime.
 
     Args:
         file_path (str): Path to the artifact file.
@@ -40,11 +109,16 @@ def record_artifact_as_dict(file_path):
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
 
-    # Compute the SHA256 hash of the file
     hash_algorithm = "sha256"
-    hash_digest = hashlib.sha256()
+    key = _artifact_key(file_path)
+    with _artifact_digests_lock:
+        digest = _artifact_digests.get(key)
+    if digest:
+        return {hash_algorithm: digest}
+
+    # Compute the SHA256 hash of the file
     with open(file_path, "rb") as f:
-        while chunk := f.read(8192):
-            hash_digest.update(chunk)
+        digest, _ = hash_fileobj(f)
 
-    return {hash_algorithm: hash_digest.hexdigest()}
\ No newline at end of file
+    _store_digest(key, digest)
+    return {hash_algorithm: digest}
@@ -1,6 +1,12 @@
 import boto3
+import hashlib
+import json
 import os
-from botocore.exceptions import NoCredentialsError
+from concurrent.futures import ThreadPoolExecutor
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError, NoCredentialsError
+from shared.artifact_cache import HashingWriter, fetch_through_cache, is_cache_enabled
 
 # Load environment variables
 MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT")
@@ -12,19 +18,62 @@ TRAINING_BUCKET = os.getenv("TRAINING_BUCKET", "training-jobs")
 WORKER_SCANS_BUCKET = os.getenv("WORKER_SCANS_BUCKET", "worker-scans")
 SCANNER_SCANS_BUCKET = os.getenv("SCANNER_SCANS_BUCKET", "scanner-scans")
 
+# Small summary of the newest vulnerability scan, published under each scans prefix
+LATEST_SCAN_SUMMARY_NAME = "latest.json"
+
+# Transfer tuning
+MINIO_MULTIPART_CHUNKSIZE = int(
+    os.getenv("MINIO_MULTIPART_CHUNKSIZE", 16 * 1024 * 1024))  # 16 MB parts
+# Read size when hashing an object straight from its GetObject body
+HASH_CHUNK_SIZE = 1024 * 1024
+# Threads used for the parts of a single transfer
+MINIO_MAX_CONCURRENCY = int(os.getenv("MINIO_MAX_CONCURRENCY", 8))
+# Transfers run at the same time by the batch helpers
+MINIO_MAX_PARALLEL_TRANSFERS = int(
+    os.getenv("MINIO_MAX_PARALLEL_TRANSFERS", 4))
+# Must cover MINIO_MAX_PARALLEL_TRANSFERS * MINIO_MAX_CONCURRENCY to avoid waiting on connections
+MINIO_MAX_POOL_CONNECTIONS = int(
+    os.getenv("MINIO_MAX_POOL_CONNECTIONS", 32))
+
 # Initialize MinIO client
 s3_client = boto3.client(
     "s3",
     endpoint_url=MINIO_ENDPOINT,
     aws_access_key_id=MINIO_ACCESS_KEY,
     aws_secret_access_key=MINIO_SECRET_KEY,
+    config=Config(max_pool_connections=MINIO_MAX_POOL_CONNECTIONS),
+)
+
+transfer_config = TransferConfig(
+    multipart_threshold=MINIO_MULTIPART_CHUNKSIZE,
+    multipart_chunksize=MINIO_MULTIPART_CHUNKSIZE,
+    max_concurrency=MINIO_MAX_CONCURRENCY,
+    use_threads=True,
 )
 
 
-def upload_file_to_minio(file_path, object_name, bucket_name):
-    """Upload a file to a specific MinIO bucket."""
+def upload_file_to_minio(file_path, object_name, bucket_name, metadata=None):
+    """Upload a file to a specific MinIO bucket, optionally with user metadata (e.g. its sha256)."""
+    try:
+        extra_args = {"Metadata": metadata} if metadata else None
+        s3_client.upload_file(file_path, bucket_name, object_name,
+                              ExtraArgs=extra_args, Config=transfer_config)
+        return f"{MINIO_ENDPOINT}/{bucket_name}/{object_name}"
+    except NoCredentialsError:
+        raise Exception("MinIO credentials not available")
+    except Exception as e:
+        raise Exception(f"Failed to upload file to MinIO: {str(e)}")
+
+
+def upload_fileobj_to_minio(fileobj, object_name, bucket_name, metadata=None):
+    """
+    Stream a readable binary file object (e.g. an uploaded file) to a specific MinIO bucket
+    as a multipart upload, optionally with user metadata (e.g. its sha256).
+    """
     try:
-        s3_client.upload_file(file_path, bucket_name, object_name)
+        extra_args = {"Metadata": metadata} if metadata else None
+        s3_client.upload_fileobj(fileobj, bucket_name, object_name,
+                                 ExtraArgs=extra_args, Config=transfer_config)
         return f"{MINIO_ENDPOINT}/{bucket_name}/{object_name}"
     except NoCredentialsError:
         raise Exception("MinIO credentials not available")
@@ -33,13 +82,112 @@ def upload_file_to_minio(file_path, object_name, bucket_name):
 
 
 def download_file_from_minio(object_name, download_path, bucket_name):
-    """Download a file from a specific MinIO bucket."""
+    """
+    Download a file from a specific MinIO bucket, through the artifact cache if enabled.
+    The file is hashed while it streams; its sha256 hex digest is returned. If the object
+    carries a sha256 in its metadata (set at submission time), the download is checked against it.
+    """
     try:
-        s3_client.download_file(bucket_name, object_name, download_path)
+        head = s3_client.head_object(Bucket=bucket_name, Key=object_name)
+        # Job objects are written once, so the ETag identifies the content we download
+        etag = head["ETag"]
+        expected_sha256 = head.get("Metadata", {}).get("sha256")
+
+        if is_cache_enabled():
+            return fetch_through_cache(
+                bucket_name, object_name, etag, download_path,
+                lambda fileobj: s3_client.download_fileobj(
+                    bucket_name, object_name, fileobj, Config=transfer_config),
+                sha256=expected_sha256,
+            )
+
+        with open(download_path, "wb") as f:
+            writer = HashingWriter(f)
+            s3_client.download_fileobj(
+                bucket_name, object_name, writer, Config=transfer_config)
+        digest = writer.hexdigest()
+        if expected_sha256 and digest != expected_sha256:
+            raise ValueError(
+                f"sha256 {digest} does not match the submitted digest {expected_sha256}")
+        return digest
     except Exception as e:
         raise Exception(f"Failed to download file from MinIO: {str(e)}")
 
 
+def hash_object_in_minio(object_name, bucket_name):
+    """
+    Compute the sha256 of an object by streaming its GetObject body, without writing it anywhere.
+
+    Args:
+        object_name (str): Key of the object.
+        bucket_name (str): Bucket the object lives in.
+
+    Returns:
+        tuple: (sha256 hex digest, size in bytes).
+    """
+    try:
+        response = s3_client.get_object(Bucket=bucket_name, Key=object_name)
+        hash_digest = hashlib.sha256()
+        size = 0
+        for chunk in response["Body"].iter_chunks(chunk_size=HASH_CHUNK_SIZE):
+            hash_digest.update(chunk)
+            size += len(chunk)
+        return hash_digest.hexdigest(), size
+    except Exception as e:
+        raise Exception(f"Failed to hash file in MinIO: {str(e)}")
+
+
+def _run_transfers(transfer, jobs):
+    """Run transfer(*job) for every job concurrently and return the results in order."""
+    if len(jobs) <= 1:
+        return [transfer(*job) for job in jobs]
+    with ThreadPoolExecutor(max_workers=min(MINIO_MAX_PARALLEL_TRANSFERS, len(jobs))) as executor:
+        futures = [executor.submit(transfer, *job) for job in jobs]
+        # result() re-raises the first failing transfer after all have been started
+        return [future.result() for future in futures]
+
+
+def upload_files_to_minio(uploads):
+    """
+    Upload several files to MinIO concurrently.
+
+    Args:
+        uploads (list): Tuples of (file_path, object_name, bucket_name) or
+            (file_path, object_name, bucket_name, metadata).
+
+    Returns:
+        list: The MinIO URLs of the uploaded files, in the order of uploads.
+    """
+    return _run_transfers(upload_file_to_minio, uploads)
+
+
+def upload_fileobjs_to_minio(uploads):
+    """
+    Stream several file objects to MinIO concurrently.
+
+    Args:
+        uploads (list): Tuples of (fileobj, object_name, bucket_name) or
+            (fileobj, object_name, bucket_name, metadata).
+
+    Returns:
+        list: The MinIO URLs of the uploaded files, in the order of uploads.
+    """
+    return _run_transfers(upload_fileobj_to_minio, uploads)
+
+
+def download_files_from_minio(downloads):
+    """
+    Download several files from MinIO concurrently.
+
+    Args:
+        downloads (list): Tuples of (object_name, download_path, bucket_name).
+
+    Returns:
+        list: The sha256 hex digests of the downloaded files, in the order of downloads.
+    """
+    return _run_transfers(download_file_from_minio, downloads)
+
+
 def remove_file_from_minio(object_name, bucket_name):
     """Remove a file from a specific MinIO bucket."""
     try:
@@ -72,6 +220,58 @@ def list_files_in_bucket(prefix, bucket_name):
         raise Exception(f"Failed to list files in bucket: {str(e)}")
 
 
+def upload_json_to_minio(data, object_name, bucket_name):
+    """Upload a small JSON document to a specific MinIO bucket, overwriting the object if it exists."""
+    try:
+        s3_client.put_object(Bucket=bucket_name, Key=object_name, Body=json.dumps(
+            data).encode(), ContentType="application/json")
+        return f"{MINIO_ENDPOINT}/{bucket_name}/{object_name}"
+    except Exception as e:
+        raise Exception(f"Failed to upload JSON to MinIO: {str(e)}")
+
+
+def get_object_from_minio(object_name, bucket_name):
+    """Read a small object from a specific MinIO bucket into memory and return its bytes."""
+    try:
+        response = s3_client.get_object(Bucket=bucket_name, Key=object_name)
+        return response["Body"].read()
+    except Exception as e:
+        raise Exception(f"Failed to get object from MinIO: {str(e)}")
+
+
+def get_json_from_minio(object_name, bucket_name):
+    """Fetch a small JSON document from a specific MinIO bucket."""
+    try:
+        return json.loads(get_object_from_minio(object_name, bucket_name))
+    except Exception as e:
+        raise Exception(f"Failed to get JSON from MinIO: {str(e)}")
+
+
+def get_json_from_minio_if_changed(object_name, bucket_name, etag=None):
+    """
+    Fetch a small JSON document with a conditional GET.
+
+    Args:
+        object_name (str): Key of the object.
+        bucket_name (str): Bucket the object lives in.
+        etag (str, optional): ETag of the copy the caller already has.
+
+    Returns:
+        tuple: (data, etag). data is None if the object still matches the given etag.
+    """
+    try:
+        extra_args = {"IfNoneMatch": etag} if etag else {}
+        response = s3_client.get_object(
+            Bucket=bucket_name, Key=object_name, **extra_args)
+        return json.loads(response["Body"].read()), response["ETag"]
+    except ClientError as e:
+        if e.response.get("ResponseMetadata", {}).get("HTTPStatusCode") == 304:
+            return None, etag
+        raise Exception(f"Failed to get JSON from MinIO: {str(e)}")
+    except Exception as e:
+        raise Exception(f"Failed to get JSON from MinIO: {str(e)}")
+
+
 def generate_presigned_url(object_name, bucket_name, expiration=3600):
     """Generate a presigned URL for a file in a specific MinIO bucket."""
     try:
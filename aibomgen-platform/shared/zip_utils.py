@@ -1,48 +1,90 @@
 import zipfile
 import os
 import shutil
+import struct
+import zlib
+from collections import namedtuple
 
 MAX_ZIP_FILE_SIZE = 100 * 1024 * 1024  # 100 MB
 MAX_TOTAL_UNCOMPRESSED_SIZE = 500 * 1024 * 1024  # 500 MB
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50 MB
+# Member types allowed by default (image datasets), other dataset types pass their own set
 ALLOWED_EXTENSIONS = {".jpg", ".png", ".csv"}
 
+LOCAL_FILE_HEADER_SIGNATURE = b"PK\x03\x04"
+LOCAL_FILE_HEADER_SIZE = 30
+
+# A validated .zip member and where its data lives in the archive
+ZipMember = namedtuple(
+    "ZipMember", ["filename", "data_offset", "compress_size", "file_size", "compress_type", "crc"])
+
 class ZipValidationError(Exception):
     """Custom exception for zip validation errors."""
     pass
 
 def validate_zip_file(zip_path):
-    """Validate the .zip file for size and structure."""
+    """Validate the .zip file for size and structure. Accepts a path or a seekable binary file object."""
     # Check file size
-    if os.path.getsize(zip_path) > MAX_ZIP_FILE_SIZE:
+    if isinstance(zip_path, (str, os.PathLike)):
+        zip_size = os.path.getsize(zip_path)
+    else:
+        zip_size = zip_path.seek(0, os.SEEK_END)
+    if zip_size > MAX_ZIP_FILE_SIZE:
         raise ZipValidationError("Uploaded .zip file is too large.")
 
     # Check if it's a valid .zip file
     if not zipfile.is_zipfile(zip_path):
         raise ZipValidationError("Uploaded file is not a valid .zip archive.")
 
-def validate_and_extract_zip(zip_path, extract_to):
-    """Validate and safely extract a .zip file."""
-    validate_zip_file(zip_path)  # Perform basic validation
+def _validate_member_path(filename):
+    """Reject absolute member paths and members that escape the archive root."""
+    normalized = os.path.normpath(filename.replace("\\", "/"))
+    if os.path.isabs(normalized) or normalized == ".." or normalized.startswith("../"):
+        raise ZipValidationError("Path traversal detected in .zip file!")
 
-    # Extract safely
-    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        total_uncompressed_size = 0
+def _member_data_offset(zip_file, member):
+    """Return the offset of a member's (compressed) data, right after its local file header."""
+    zip_file.seek(member.header_offset)
+    header = zip_file.read(LOCAL_FILE_HEADER_SIZE)
+    if len(header) != LOCAL_FILE_HEADER_SIZE or header[:4] != LOCAL_FILE_HEADER_SIGNATURE:
+        raise ZipValidationError(
+            f"Corrupt local file header for {member.filename} in .zip file.")
+    filename_length, extra_length = struct.unpack("<HH", header[26:30])
+    return member.header_offset + LOCAL_FILE_HEADER_SIZE + filename_length + extra_length
+
+def index_zip_file(zip_path, allowed_extensions=ALLOWED_EXTENSIONS):
+    """
+    Validate a .zip file and index its members in a single pass over the central directory,
+    without extracting anything.
+
+    Args:
+        zip_path (str): Path to the .zip file.
+        allowed_extensions (set): Lowercase file extensions members may have.
+
+    Returns:
+        list[ZipMember]: The file members (directories excluded), in archive order.
+    """
+    validate_zip_file(zip_path)  # Perform basic validation
 
+    members = []
+    total_uncompressed_size = 0
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref, open(zip_path, "rb") as zip_file:
         for member in zip_ref.infolist():
             # Prevent path traversal
-            member_path = os.path.realpath(os.path.join(extract_to, member.filename))
-            if not member_path.startswith(os.path.realpath(extract_to)):
-                raise ZipValidationError("Path traversal detected in .zip file!")
+            _validate_member_path(member.filename)
 
             # Skip directories (only validate files)
             if member.is_dir():
                 continue
 
             # Check file extensions
-            if not os.path.splitext(member.filename)[1].lower() in ALLOWED_EXTENSIONS:
+            if not os.path.splitext(member.filename)[1].lower() in allowed_extensions:
                 raise ZipValidationError(f"Invalid file type in .zip file: {member.filename}")
 
+            # Encrypted members cannot be read without a password
+            if member.flag_bits & 0x1:
+                raise ZipValidationError(f"Encrypted file in .zip file: {member.filename}")
+
             # Check individual file size
             if member.file_size > MAX_FILE_SIZE:
                 raise ZipValidationError(f"File {member.filename} exceeds the maximum allowed size of {MAX_FILE_SIZE} bytes.")
@@ -52,5 +94,41 @@ def validate_and_extract_zip(zip_path, extract_to):
             if total_uncompressed_size > MAX_TOTAL_UNCOMPRESSED_SIZE:
                 raise ZipValidationError("The total uncompressed size of the .zip file exceeds the allowed limit.")
 
-        # Extract files
-        zip_ref.extractall(extract_to)
\ No newline at end of file
+            members.append(ZipMember(
+                filename=member.filename,
+                data_offset=_member_data_offset(zip_file, member),
+                compress_size=member.compress_size,
+                file_size=member.file_size,
+                compress_type=member.compress_type,
+                crc=member.CRC,
+            ))
+    return members
+
+def read_zip_member(zip_path, member):
+    """
+    Read and decompress a single indexed member of a .zip file.
+    Only the member's bytes are read, so members can be read concurrently without sharing a ZipFile handle.
+    """
+    if member.compress_type in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+        with open(zip_path, "rb") as zip_file:
+            zip_file.seek(member.data_offset)
+            data = zip_file.read(member.compress_size)
+        if member.compress_type == zipfile.ZIP_DEFLATED:
+            data = zlib.decompress(data, -zlib.MAX_WBITS)  # Raw deflate stream
+    else:
+        # Other compression methods are rare for images, let zipfile handle them
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            return zip_ref.read(member.filename)
+
+    if len(data) != member.file_size or zlib.crc32(data) != member.crc:
+        raise ZipValidationError(f"Corrupt file in .zip file: {member.filename}")
+    return data
+
+def validate_and_extract_zip(zip_path, extract_to, allowed_extensions=ALLOWED_EXTENSIONS):
+    """Validate and safely extract a .zip file. Returns the extracted file members."""
+    members = index_zip_file(zip_path, allowed_extensions)  # Validate every member before extracting anything
+
+    # Extract files
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        zip_ref.extractall(extract_to)
+    return members
@@ -0,0 +1,132 @@
+import http.client
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+# Regression benchmark: the latency of small API requests must not depend on the size of an upload
+# that is being processed at the same time. Run it against a running platform (docker-compose up).
+
+API_URL = os.getenv("API_URL", "http://localhost:8000")
+# Sizes of the upload sent alongside the probe requests (0 measures the baseline)
+UPLOAD_SIZES_MB = [int(size) for size in os.getenv(
+    "UPLOAD_SIZES_MB", "0,64,512,2048").split(",")]
+# Small request timed while the upload is in flight: a database lookup answered with a 404
+PROBE_PATH = "/verifier/job_input_digests/benchmark-probe"
+MIN_PROBES = 20
+# Fail when the p95 probe latency under load exceeds this multiple of the baseline p95
+MAX_P95_RATIO = float(os.getenv("MAX_P95_RATIO", 3.0))
+# Latencies below this are treated as noise when comparing with the baseline
+NOISE_FLOOR_SECONDS = 0.05
+# Fail when any single probe waits longer than this, e.g. while the event loop hashes an upload
+MAX_STALL_SECONDS = float(os.getenv("MAX_STALL_SECONDS", 0.5))
+
+
+def connect():
+    parts = urlsplit(API_URL)
+    return http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=3600)
+
+
+def probe_latency():
+    """Time one small request on a fresh connection."""
+    conn = connect()
+    start_time = time.perf_counter()
+    conn.request("GET", PROBE_PATH)
+    conn.getresponse().read()
+    elapsed = time.perf_counter() - start_time
+    conn.close()
+    return elapsed
+
+
+def upload_file(file_path):
+    """
+    Stream a file to verify_file_hash as a multipart upload, without loading it into memory.
+    The endpoint reads and hashes all of it before answering.
+    """
+    boundary = uuid.uuid4().hex
+    link = json.dumps({"signatures": [], "signed": {
+        "_type": "link", "name": "run_training", "materials": {}, "products": {},
+        "byproducts": {}, "command": [], "environment": {}}}).encode()
+    head = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"link_file\"; filename=\"run_training.link\"\r\n"
+        f"Content-Type: application/json\r\n\r\n").encode() + link + (
+        f"\r\n--{boundary}\r\nContent-Disposition: form-data; name=\"uploaded_file\"; filename=\"benchmark.bin\"\r\n"
+        f"Content-Type: application/octet-stream\r\n\r\n").encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+
+    conn = connect()
+    conn.putrequest("POST", "/verifier/verify_file_hash")
+    conn.putheader("Content-Type", f"multipart/form-data; boundary={boundary}")
+    conn.putheader("Content-Length", str(
+        len(head) + os.path.getsize(file_path) + len(tail)))
+    conn.endheaders()
+    conn.send(head)
+    with open(file_path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            conn.send(chunk)
+    conn.send(tail)
+    conn.getresponse().read()
+    conn.close()
+
+
+def measure(size_mb, work_dir):
+    """Probe the API while an upload of size_mb is in flight and return the probe latencies."""
+    upload_seconds = 0.0
+    upload_thread = None
+    if size_mb:
+        file_path = os.path.join(work_dir, f"upload_{size_mb}mb.bin")
+        with open(file_path, "wb") as f:
+            f.truncate(size_mb * 1024 * 1024)  # Sparse, the content does not matter
+
+        def run_upload():
+            nonlocal upload_seconds
+            start_time = time.perf_counter()
+            upload_file(file_path)
+            upload_seconds = time.perf_counter() - start_time
+
+        upload_thread = threading.Thread(target=run_upload)
+        upload_thread.start()
+        time.sleep(0.2)  # Let the upload get going
+
+    latencies = []
+    while len(latencies) < MIN_PROBES or (upload_thread and upload_thread.is_alive()):
+        latencies.append(probe_latency())
+
+    if upload_thread:
+        upload_thread.join()
+    return latencies, upload_seconds
+
+
+def p95(latencies):
+    return statistics.quantiles(latencies, n=20)[-1]
+
+
+if __name__ == "__main__":
+    # Warm up connections and caches so they do not skew the baseline
+    for _ in range(5):
+        probe_latency()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size_mb in UPLOAD_SIZES_MB:
+            results[size_mb] = measure(size_mb, work_dir)
+
+    print(f"{'upload MB':>10} {'upload s':>9} {'probes':>7} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for size_mb, (latencies, upload_seconds) in results.items():
+        print(f"{size_mb:>10} {upload_seconds:>9.2f} {len(latencies):>7} {statistics.median(latencies) * 1000:>8.1f} "
+              f"{p95(latencies) * 1000:>8.1f} {max(latencies) * 1000:>8.1f}")
+
+    baseline = p95(results[min(results)][0])
+    limit = max(baseline * MAX_P95_RATIO, NOISE_FLOOR_SECONDS)
+    regressions = [size_mb for size_mb, (latencies, _) in results.items()
+                   if p95(latencies) > limit or max(latencies) > MAX_STALL_SECONDS]
+    if regressions:
+        print(f"FAIL: p95 latency above {limit * 1000:.1f} ms or a stall above {MAX_STALL_SECONDS * 1000:.0f} ms "
+              f"during uploads of {regressions} MB.")
+        sys.exit(1)
+    print(f"OK: p95 latency stays below {limit * 1000:.1f} ms and no probe stalls for all upload sizes.")
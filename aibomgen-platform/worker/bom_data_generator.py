@@ -10,7 +10,7 @@ from cryptography.hazmat.primitives.serialization import load_pem_private_key
 import base64
 
 
-def generate_basic_bom_data(task_logger, environment, materials, products, fit_params=None, optional_params=None, link_file_minio_path=None, unique_dir=None):
+def generate_basic_bom_data(task_logger, environment, materials, products, fit_params=None, optional_params=None, link_file_minio_path=None, unique_dir=None, dataset_statistics=None):
     """
     Generate the basic BOM data as a dictionary, grouped into environment, materials, products, fit_params, and optional_params.
 
@@ -22,6 +22,7 @@ def generate_basic_bom_data(task_logger, environment, materials, products, fit_p
         fit_params (dict): Configuration details for the training process.
         optional_params (dict): Optional parameters for the model metadata.
         link_file_minio_path (str): MinIO path to the uploaded in-toto .link file.
+        dataset_statistics (dict): Summary of the dataset statistics pass (see dataset_statistics).
 
     Returns:
         dict: The generated BOM data grouped by categories.
@@ -81,6 +82,7 @@ def generate_basic_bom_data(task_logger, environment, materials, products, fit_p
             "framework": optional_params.get("framework", "Unknown") or "Unknown",
             "license_name": optional_params.get("license_name", "Unknown") or "Unknown",
         },
+        "dataset_statistics": dataset_statistics or {},
     }
 
     # Add the .link file as an attestation
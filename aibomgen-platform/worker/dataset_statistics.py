@@ -0,0 +1,127 @@
+import hashlib
+import numpy as np
+from shared.artifact_cache import load_cached_json, store_cached_json
+
+# Bump when the summary format changes, so cached statistics are recomputed
+DATASET_STATISTICS_VERSION = 1
+
+
+class StreamingStatistics:
+    """
+    Per-feature count, mean, variance, min and max plus class counts, accumulated batch by batch.
+    Batch moments are computed with vectorized reductions and merged into the running moments
+    with the parallel Welford update (Chan et al.), in float64.
+    """
+
+    def __init__(self, feature_names=None):
+        self.feature_names = feature_names
+        self.count = 0
+        self.mean = None
+        self.m2 = None
+        self.min = None
+        self.max = None
+        self.class_counts = {}
+
+    def update(self, features=None, labels=None):
+        """Add a batch of examples: features of shape [batch, ...] and/or labels of shape [batch]."""
+        if labels is not None:
+            values, counts = np.unique(np.asarray(labels), return_counts=True)
+            for value, count in zip(values.tolist(), counts.tolist()):
+                self.class_counts[value] = self.class_counts.get(value, 0) + count
+
+        if features is None:
+            if labels is not None:
+                self.count += len(labels)
+            return
+
+        features = np.asarray(features, dtype=np.float64)
+        features = features.reshape(len(features), -1)
+        batch_count = len(features)
+        if batch_count == 0:
+            return
+        batch_mean = features.mean(axis=0)
+        batch_m2 = ((features - batch_mean) ** 2).sum(axis=0)
+
+        if self.mean is None:
+            self.mean, self.m2 = batch_mean, batch_m2
+            self.min, self.max = features.min(axis=0), features.max(axis=0)
+        else:
+            total = self.count + batch_count
+            delta = batch_mean - self.mean
+            self.mean = self.mean + delta * batch_count / total
+            self.m2 = self.m2 + batch_m2 + delta ** 2 * self.count * batch_count / total
+            self.min = np.minimum(self.min, features.min(axis=0))
+            self.max = np.maximum(self.max, features.max(axis=0))
+        self.count += batch_count
+
+    def summary(self):
+        """Return the statistics as a JSON serializable dict."""
+        summary = {
+            "version": DATASET_STATISTICS_VERSION,
+            "num_examples": self.count,
+            "class_counts": {str(label): count for label, count in sorted(self.class_counts.items())},
+        }
+        if self.mean is not None:
+            names = self.feature_names or [
+                f"feature_{i}" for i in range(len(self.mean))]
+            variance = self.m2 / self.count
+            summary["features"] = {
+                name: {
+                    "mean": float(self.mean[i]),
+                    "variance": float(variance[i]),
+                    "min": float(self.min[i]),
+                    "max": float(self.max[i]),
+                }
+                for i, name in enumerate(names)
+            }
+        return summary
+
+
+def feature_moments(summary):
+    """
+    Return the per-feature mean and standard deviation of a statistics summary
+    as float32 arrays, in feature order, for use as normalization constants.
+    """
+    if not summary.get("features"):
+        raise ValueError(
+            "Dataset statistics contain no feature values, the dataset is empty.")
+    features = list(summary["features"].values())
+    mean = np.array([f["mean"] for f in features], dtype=np.float32)
+    std = np.sqrt(np.array([f["variance"] for f in features], dtype=np.float32))
+    return mean, std
+
+
+def dataset_statistics_cache_key(dataset_sha256, dataset_definition_sha256):
+    """Cache key of the statistics of a dataset as interpreted by a dataset definition."""
+    if not dataset_sha256 or not dataset_definition_sha256:
+        return None
+    return hashlib.sha256(
+        f"{DATASET_STATISTICS_VERSION}\0{dataset_sha256}\0{dataset_definition_sha256}".encode()).hexdigest()
+
+
+def get_dataset_statistics(task_logger, cache_key, compute):
+    """
+    Return the statistics summary of a dataset, computing it only if it is not cached yet.
+
+    Args:
+        task_logger (Logger): Logger for task-specific information.
+        cache_key (str): Key from dataset_statistics_cache_key, or None to skip the cache.
+        compute (callable): Runs the statistics pass and returns a StreamingStatistics.
+
+    Returns:
+        dict: The statistics summary.
+    """
+    if cache_key:
+        summary = load_cached_json("dataset_statistics", cache_key)
+        if summary is not None:
+            task_logger.info("Using cached dataset statistics.")
+            return summary
+
+    task_logger.info("Computing dataset statistics...")
+    summary = compute().summary()
+    task_logger.info(
+        f"Dataset statistics computed over {summary['num_examples']} examples.")
+
+    if cache_key:
+        store_cached_json("dataset_statistics", cache_key, summary)
+    return summary
@@ -6,10 +6,37 @@ from celery import current_task
 from pynvml import nvmlInit, nvmlDeviceGetHandleByIndex, nvmlDeviceGetCount, nvmlDeviceGetName, nvmlDeviceGetMemoryInfo, nvmlShutdown
 import docker
 import subprocess
-import json
-from shared.minio_utils import download_file_from_minio, list_files_in_bucket, WORKER_SCANS_BUCKET
+import threading
+from shared.minio_utils import get_json_from_minio_if_changed, WORKER_SCANS_BUCKET, LATEST_SCAN_SUMMARY_NAME
 
-def extract_environment_details(task_logger, unique_dir, start_task_time, start_training_time, start_aibom_time):
+# Last vulnerability scan summary fetched by this process and its ETag
+_scan_summary_cache = {"etag": None, "summary": None}
+_scan_summary_lock = threading.Lock()
+
+def extract_static_environment_details(task_logger=None):
+    """
+    Extract the environment details that do not change during the lifetime of a worker process
+    (platform, TensorFlow, CPU, memory, disk, GPU models and Docker information).
+    GPU memory usage changes between tasks, so it is left out and queried per task.
+
+    Args:
+        task_logger (Logger, optional): Logger for logging task-specific information.
+
+    Returns:
+        dict: A dictionary containing the static environment details.
+    """
+    return {
+        "os": platform.system() + " " + platform.release(),
+        "python_version": platform.python_version(),
+        "tensorflow_version": get_tensorflow_version(),
+        "cpu_count": psutil.cpu_count(logical=True),
+        "memory_total": psutil.virtual_memory().total // (1024 * 1024),  # in MB
+        "disk_usage": psutil.disk_usage('/').total // (1024 * 1024),  # in MB
+        "gpu_info": get_gpu_info(task_logger=task_logger, include_usage=False),
+        "docker_info": get_docker_info(task_logger=task_logger),
+    }
+
+def extract_environment_details(task_logger, unique_dir, start_task_time, start_training_time, start_aibom_time, static_details=None):
     """
     Extract useful environment details for the training process, including GPU, Celery, Docker, and vulnerability information.
 
@@ -19,6 +46,8 @@ def extract_environment_details(task_logger, unique_dir, start_task_time, start_
         start_task_time (float): Task start time in seconds since epoch.
         start_training_time (float): Training start time in seconds since epoch.
         start_aibom_time (float): AIBoM generation start time in seconds since epoch.
+        static_details (dict, optional): Snapshot from extract_static_environment_details,
+            taken once per worker process. Extracted now if omitted.
 
     Returns:
         dict: A dictionary containing environment details.
@@ -27,29 +56,24 @@ def extract_environment_details(task_logger, unique_dir, start_task_time, start_
         task_logger.info("Extracting environment details...")
 
         # Extract details
-        os_info = platform.system() + " " + platform.release()
-        python_version = platform.python_version()
-        tensorflow_version = get_tensorflow_version()
-        cpu_count = psutil.cpu_count(logical=True)
-        memory_total = psutil.virtual_memory().total // (1024 * 1024)  # in MB
-        disk_usage = psutil.disk_usage('/').total // (1024 * 1024)  # in MB
-        gpu_info = get_gpu_info(task_logger=task_logger)
+        if static_details is None:
+            static_details = extract_static_environment_details(task_logger=task_logger)
+        gpu_info = static_details["gpu_info"]
+        if isinstance(gpu_info, list) and gpu_info:
+            # Add the current memory usage to the GPUs of the snapshot
+            memory_used = get_gpu_memory_used(task_logger=task_logger)
+            if memory_used is not None:
+                gpu_info = [{**gpu, "memory_used": used}
+                            for gpu, used in zip(gpu_info, memory_used)]
         celery_task_info = get_celery_task_info(task_logger=task_logger)
-        docker_info = get_docker_info(task_logger=task_logger)
         vulnerability_scan = fetch_latest_vulnerability_scan_from_minio(unique_dir, task_logger=task_logger)        
         
         task_logger.info("Environment details extracted successfully.")
 
         return {
-            "os": os_info,
-            "python_version": python_version,
-            "tensorflow_version": tensorflow_version,
-            "cpu_count": cpu_count,
-            "memory_total": memory_total,
-            "disk_usage": disk_usage,
+            **static_details,
             "gpu_info": gpu_info,
             "celery_task_info": celery_task_info,
-            "docker_info": docker_info,
             "vulnerability_scan": vulnerability_scan,
             "request_time": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(start_task_time)),
             "start_training_time": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(start_training_time)),
@@ -89,12 +113,13 @@ def get_tensorflow_version(task_logger=None):
             task_logger.error(f"Error retrieving TensorFlow version: {str(e)}")
         return "Unknown"
     
-def get_gpu_info(task_logger=None):
+def get_gpu_info(task_logger=None, include_usage=True):
     """
     Get GPU information using NVIDIA's NVML library.
 
     Args:
         task_logger (Logger, optional): Logger for logging task-specific information.
+        include_usage (bool, optional): Include the memory currently used on each GPU.
 
     Returns:
         list: A list of dictionaries containing GPU details or 'No GPU detected' if no GPU is available.
@@ -109,11 +134,13 @@ def get_gpu_info(task_logger=None):
             handle = nvmlDeviceGetHandleByIndex(i)
             name = nvmlDeviceGetName(handle).decode("utf-8")
             memory_info = nvmlDeviceGetMemoryInfo(handle)
-            gpus.append({
+            gpu = {
                 "name": name,
                 "memory_total": memory_info.total // (1024 * 1024),  # in MB
-                "memory_used": memory_info.used // (1024 * 1024),    # in MB
-            })
+            }
+            if include_usage:
+                gpu["memory_used"] = memory_info.used // (1024 * 1024)  # in MB
+            gpus.append(gpu)
         nvmlShutdown()
         if task_logger:
             task_logger.info("GPU information retrieved successfully.")
@@ -123,6 +150,27 @@ def get_gpu_info(task_logger=None):
             task_logger.error(f"Error retrieving GPU info: {str(e)}")
         return f"Error retrieving GPU info: {str(e)}"
     
+def get_gpu_memory_used(task_logger=None):
+    """
+    Get the memory currently used on each GPU using NVIDIA's NVML library.
+
+    Args:
+        task_logger (Logger, optional): Logger for logging task-specific information.
+
+    Returns:
+        list: Memory used per GPU in MB, in device order, or None if it cannot be retrieved.
+    """
+    try:
+        nvmlInit()
+        memory_used = [nvmlDeviceGetMemoryInfo(nvmlDeviceGetHandleByIndex(i)).used // (1024 * 1024)
+                       for i in range(nvmlDeviceGetCount())]
+        nvmlShutdown()
+        return memory_used
+    except Exception as e:
+        if task_logger:
+            task_logger.error(f"Error retrieving GPU memory usage: {str(e)}")
+        return None
+    
 def get_docker_info(task_logger=None):
     """
     Get Docker container and image information using the Docker SDK.
@@ -197,7 +245,8 @@ def get_celery_task_info(task_logger=None):
     
 def fetch_latest_vulnerability_scan_from_minio(unique_dir, task_logger=None):
     """
-    Fetch the latest vulnerability scan results from MinIO.
+    Fetch the summary of the latest vulnerability scan, published by the scanner next to the full report.
+    The summary is cached in-process and revalidated with a conditional GET on its ETag.
 
     Args:
         unique_dir (str): Unique directory for the task.
@@ -208,40 +257,26 @@ def fetch_latest_vulnerability_scan_from_minio(unique_dir, task_logger=None):
     """
     try:
         if task_logger:
-            task_logger.info("Fetching the latest vulnerability scan results from MinIO...")
-
-        # List all files in the vulnerability scans bucket
-        bucket_prefix = "worker-vulnerability-scans/"
-        files = list_files_in_bucket(bucket_prefix, WORKER_SCANS_BUCKET)
-
-        if not files:
-            if task_logger:
-                task_logger.warning("No vulnerability scan files found in MinIO.")
-            return {"error": "No vulnerability scan files found."}
-
-        # Find the latest file based on timestamp in the filename
-        latest_file = max(files, key=lambda x: x.split("_")[-1].replace(".json", ""))
-        local_file = f"/tmp/{os.path.basename(latest_file)}"
-
-        # Download the latest file
-        download_file_from_minio(latest_file, local_file, WORKER_SCANS_BUCKET)
-
-        # Parse the JSON file
-        with open(local_file, "r") as f:
-            vulnerabilities = json.load(f)
+            task_logger.info("Fetching the latest vulnerability scan summary from MinIO...")
 
-        # Summarize vulnerabilities by severity
-        summary = {}
-        for result in vulnerabilities.get("Results", []):
-            for vuln in result.get("Vulnerabilities", []):
-                severity = vuln.get("Severity", "UNKNOWN")
-                summary[severity] = summary.get(severity, 0) + 1
+        with _scan_summary_lock:
+            summary, etag = get_json_from_minio_if_changed(
+                f"worker-vulnerability-scans/{LATEST_SCAN_SUMMARY_NAME}", WORKER_SCANS_BUCKET,
+                etag=_scan_summary_cache["etag"])
+            if summary is None:
+                if task_logger:
+                    task_logger.info("Vulnerability scan summary unchanged, using the cached copy.")
+                summary = _scan_summary_cache["summary"]
+            else:
+                _scan_summary_cache.update(etag=etag, summary=summary)
 
+        severity_counts = summary.get("severity_counts", {})
         if task_logger:
-            task_logger.info(f"Latest vulnerability scan summary: {summary}")
-        return summary
+            task_logger.info(
+                f"Latest vulnerability scan summary ({summary.get('scan_object', 'Unknown')}): {severity_counts}")
+        return dict(severity_counts)
 
     except Exception as e:
         if task_logger:
             task_logger.error(f"Error fetching vulnerability scan results: {str(e)}")
-        return {"error": f"Error fetching vulnerability scan results: {str(e)}"}
\ No newline at end of file
+        return {"error": f"Error fetching vulnerability scan results: {str(e)}"}
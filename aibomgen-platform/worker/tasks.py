@@ -5,21 +5,25 @@ import time
 import yaml
 import pandas as pd
 import json
-from transform_to_cyclonedx import serialize_bom, sign_and_include_bom_as_property, transform_to_cyclonedx, sign_bom
+from concurrent.futures import ThreadPoolExecutor, wait
+from transform_to_cyclonedx import emit_bom, transform_to_cyclonedx, summarize_model_architecture
 from bom_data_generator import generate_basic_bom_data
-from shared.minio_utils import upload_file_to_minio, download_file_from_minio, TRAINING_BUCKET, remove_file_from_minio
-from shared.zip_utils import ZipValidationError, validate_and_extract_zip
+from shared.minio_utils import upload_file_to_minio, TRAINING_BUCKET, remove_file_from_minio, MINIO_MAX_PARALLEL_TRANSFERS
+from shared.zip_utils import ZipValidationError
 import logging
 from in_toto_link_generator import generate_in_toto_link
-from shared.in_toto_utils import load_signer, record_artifact_as_dict
+from shared.in_toto_utils import record_artifact_as_dict, download_and_record_artifacts
 from environment_extractor import extract_environment_details
+from dataset_statistics import dataset_statistics_cache_key
+from worker_context import get_worker_context
 
 from training_logic import (
     load_csv_dataset_with_definition,
     load_image_dataset,
     load_TFRecordDataset_with_definition,
     validate_model_and_dataset_definition,
-    apply_preprocessing
+    apply_preprocessing,
+    get_performance_profile
 )
 
 
@@ -64,32 +68,18 @@ def run_training(unique_dir, model_url, dataset_url, dataset_definition_url, opt
     task_logger.info("Starting training task...")
     task_logger.info("Logging system initialized successfully.")
 
-    try:
-
-        # Confirm GPU availability
-        gpus = tf.config.list_physical_devices('GPU')
-        if not gpus:
-            task_logger.warning("No GPU devices found!")
-        else:
-            task_logger.info(f"GPUs available: {[gpu.name for gpu in gpus]}")
+    # Output artifacts are uploaded in the background while attestation work continues;
+    # every upload is awaited before the task reports success
+    output_uploads = ThreadPoolExecutor(
+        max_workers=MINIO_MAX_PARALLEL_TRANSFERS, thread_name_prefix=f"upload_{unique_dir}")
+    pending_uploads = []
 
-        cpus = tf.config.list_physical_devices('CPU')
-        if not cpus:
-            task_logger.warning("No CPU devices found!")
-        else:
-            task_logger.info(f"CPUs available: {[cpu.name for cpu in cpus]}")
+    try:
 
-        # Device selection
-        if len(gpus) > 0 and len(cpus) > 0:
-            task_logger.info(
-                "Both GPU and CPU devices are available. Using GPU for training.")
-            tf.config.set_visible_devices(gpus[0], 'GPU')
-        elif len(cpus) > 0:
-            task_logger.info(
-                "Only CPU devices are available. Using CPU for training.")
-            tf.config.set_visible_devices(cpus[0], 'CPU')
-        else:
-            raise RuntimeError("No available devices for training.")
+        # Devices, signing keys and static environment details are set up once per worker process
+        worker_context = get_worker_context(task_logger)
+        task_logger.info(
+            f"Training devices: GPUs {worker_context['devices']['gpus']}, CPUs {worker_context['devices']['cpus']}")
 
         start_task_time = time.time()
         start_task_time_utc = time.strftime(
@@ -116,57 +106,64 @@ def run_training(unique_dir, model_url, dataset_url, dataset_definition_url, opt
         dataset_definition_path = os.path.join(
             dataset_definition_dir, dataset_definition_filename)
 
-        # Download files from MinIO
+        # Download files from MinIO concurrently (hashed while they stream, reused for the link and the BOM)
         task_logger.info("Downloading files from MinIO...")
-        download_file_from_minio(
-            f"{unique_dir}/model/{model_filename}", model_path, TRAINING_BUCKET)
-        download_file_from_minio(
-            f"{unique_dir}/dataset/{dataset_filename}", dataset_path, TRAINING_BUCKET)
-        download_file_from_minio(
-            f"{unique_dir}/definition/{dataset_definition_filename}", dataset_definition_path, TRAINING_BUCKET)
+        _, dataset_record, dataset_definition_record = download_and_record_artifacts([
+            (f"{unique_dir}/model/{model_filename}",
+             model_path, TRAINING_BUCKET),
+            (f"{unique_dir}/dataset/{dataset_filename}",
+             dataset_path, TRAINING_BUCKET),
+            (f"{unique_dir}/definition/{dataset_definition_filename}",
+             dataset_definition_path, TRAINING_BUCKET),
+        ])
 
         # Load dataset definition
         task_logger.info("Loading dataset definition...")
         with open(dataset_definition_path, "r") as f:
             dataset_definition = yaml.safe_load(f)
 
+        # Sizes come from dataset metadata and the split is index based, so no pass over the data is needed
+        batch_size = fit_params.get("batch_size") or 32
+        validation_split = fit_params.get(
+            "validation_split", 0.2)  # Default to 20% validation
+        # Input pipeline tuning (parallelism, caching, prefetching) from the dataset definition
+        performance_profile = get_performance_profile(
+            dataset_definition, cache_dir=temp_dir)
+        task_logger.info(f"Input pipeline profile: {performance_profile}")
+        # Dataset statistics are cached per dataset and dataset definition content
+        statistics_cache_key = dataset_statistics_cache_key(
+            dataset_record["sha256"], dataset_definition_record["sha256"])
+
         # Load dataset based on type
         dataset_type = dataset_definition.get("type", "csv")
         task_logger.info(f"Dataset type: {dataset_type}")
         if dataset_type == "csv":
-            dataset = load_csv_dataset_with_definition(
-                task_logger, dataset_path, dataset_definition)
+            train_dataset, val_dataset, train_size, val_size, dataset_statistics = load_csv_dataset_with_definition(
+                task_logger, dataset_path, dataset_definition, batch_size=batch_size, validation_split=validation_split, performance_profile=performance_profile, statistics_cache_key=statistics_cache_key)
         elif dataset_type == "image":
-            # Validate and extract the dataset .zip file
+            # Images are read straight from the dataset .zip, it is validated while being indexed
             dataset_zip_path = dataset_path
             if not os.path.exists(dataset_zip_path):
                 raise FileNotFoundError(
                     f"Dataset file {dataset_zip_path} does not exist.")
-            dataset_extracted_path = os.path.join(temp_dir, "dataset_unzipped")
-            os.makedirs(dataset_extracted_path, exist_ok=True)
             try:
-                task_logger.info(
-                    "Validating and extracting dataset zip file...")
-                # Validate and extract the zip file
-                validate_and_extract_zip(
-                    dataset_zip_path, dataset_extracted_path)
-                task_logger.info("Dataset zip file extracted successfully.")
-                # Load the dataset from the extracted path
-                dataset = load_image_dataset(
-                    task_logger, dataset_extracted_path, dataset_definition)
+                train_dataset, val_dataset, train_size, val_size, dataset_statistics = load_image_dataset(
+                    task_logger, dataset_zip_path, dataset_definition, batch_size=batch_size, validation_split=validation_split, performance_profile=performance_profile)
 
             except ZipValidationError as e:
                 raise Exception(f"Dataset validation failed: {str(e)}")
 
         elif dataset_type == "tfrecord":
-            dataset = load_TFRecordDataset_with_definition(
-                task_logger, dataset_path, dataset_definition)
+            train_dataset, val_dataset, train_size, val_size, dataset_statistics = load_TFRecordDataset_with_definition(
+                task_logger, dataset_path, dataset_definition, batch_size=batch_size, validation_split=validation_split, performance_profile=performance_profile, statistics_cache_key=statistics_cache_key)
         else:
             raise ValueError(f"Unsupported dataset type: {dataset_type}")
 
         # Load model
         task_logger.info("Loading model...")
         model = tf.keras.models.load_model(model_path)
+        # Summarize the architecture from the live model so the BOM never reloads it
+        architecture_summary = summarize_model_architecture(model)
 
         # Validate compatibility
         task_logger.info("Validating model and dataset compatibility...")
@@ -178,23 +175,8 @@ def run_training(unique_dir, model_url, dataset_url, dataset_definition_url, opt
             "%Y-%m-%d %H:%M:%S", time.gmtime(start_training_time))
         task_logger.info(f"Training started at UTC: {start_training_time_utc}")
 
-        # Split the dataset into training and validation subsets
-        validation_split = fit_params.get(
-            "validation_split", 0.2)  # Default to 20% validation
-        if isinstance(dataset, tf.data.Dataset) and validation_split > 0.0:
-            task_logger.info(
-                "Splitting dataset into training and validation subsets...")
-            # Calculate the number of samples in the dataset
-            dataset_size = sum(1 for _ in dataset)
-            val_size = int(validation_split * dataset_size)
-            train_size = dataset_size - val_size
-
-            # Split the dataset
-            train_dataset = dataset.take(train_size)
-            val_dataset = dataset.skip(train_size)
-        else:
-            train_dataset = dataset
-            val_dataset = None
+        task_logger.info(
+            f"Training on {train_size} examples, validating on {val_size} examples.")
 
         # Train the model using fit_params
         task_logger.info("Starting model training...")
@@ -204,10 +186,10 @@ def run_training(unique_dir, model_url, dataset_url, dataset_definition_url, opt
             epochs=fit_params.get("epochs", 50),
             verbose=2,  # 2 for one line per epoch
             initial_epoch=fit_params.get("initial_epoch", 0),
-            steps_per_epoch=fit_params.get(
-                "steps_per_epoch", train_size // fit_params.get("batch_size", 32)),
-            validation_steps=fit_params.get(
-                "validation_steps", val_size // fit_params.get("batch_size", 32)) if val_dataset else None,
+            # None or zero: Keras derives the steps from the known dataset cardinality
+            steps_per_epoch=fit_params.get("steps_per_epoch") or None,
+            validation_steps=(fit_params.get(
+                "validation_steps") or None) if val_dataset else None,
             validation_freq=fit_params.get("validation_freq", 1),
         )
         task_logger.info("Model training completed.")
@@ -217,19 +199,21 @@ def run_training(unique_dir, model_url, dataset_url, dataset_definition_url, opt
         metrics_path = os.path.join(temp_dir, "metrics.json")
         bom_path = os.path.join(temp_dir, "cyclonedx_bom.json")
 
-        # Save the trained model
+        # Save the trained model and start uploading it right away,
+        # hashing it meanwhile while it is still in the page cache
         task_logger.info("Saving trained model...")
         model.save(trained_model_path)
+        pending_uploads.append(output_uploads.submit(
+            upload_file_to_minio, trained_model_path, f"{unique_dir}/output/trained_model.keras", TRAINING_BUCKET))
+        record_artifact_as_dict(trained_model_path)
 
         # Save training metrics
         task_logger.info("Saving training metrics...")
         with open(metrics_path, "w") as f:
             json.dump(model.history.history, f)
-
-        upload_file_to_minio(
-            trained_model_path, f"{unique_dir}/output/trained_model.keras", TRAINING_BUCKET)
-        upload_file_to_minio(
-            metrics_path, f"{unique_dir}/output/metrics.json", TRAINING_BUCKET)
+        pending_uploads.append(output_uploads.submit(
+            upload_file_to_minio, metrics_path, f"{unique_dir}/output/metrics.json", TRAINING_BUCKET))
+        record_artifact_as_dict(metrics_path)
 
         # in-toto LINK ----------------------------------------------------------------------
 
@@ -241,48 +225,43 @@ def run_training(unique_dir, model_url, dataset_url, dataset_definition_url, opt
             f"AIBoM generation started at UTC: {start_aibom_time_utc}")
         task_logger.info("Generating BOM data...")
 
-        # Load the persistent private key and public key from /run/secrets
-        private_key_path = "/run/secrets/worker_private_key"
-        public_key_path = "/run/secrets/worker_public_key"
-        worker_signer = load_signer(private_key_path, public_key_path)
+        # The persistent worker keys were loaded from /run/secrets when the process started
+        worker_signer = worker_context["signer"]
 
-        # Record input and output artifacts for in-toto
-        in_toto_materials = {
-            f"{unique_dir}/model/{model_filename}": record_artifact_as_dict(model_path),
-            f"{unique_dir}/dataset/{dataset_filename}": record_artifact_as_dict(dataset_path),
-            f"{unique_dir}/definition/{dataset_definition_filename}": record_artifact_as_dict(dataset_definition_path),
+        # Record input and output artifacts for in-toto (digests are memoized, nothing is re-read)
+        material_paths = {
+            f"{unique_dir}/model/{model_filename}": model_path,
+            f"{unique_dir}/dataset/{dataset_filename}": dataset_path,
+            f"{unique_dir}/definition/{dataset_definition_filename}": dataset_definition_path,
+        }
+        product_paths = {
+            f"{unique_dir}/output/trained_model.keras": trained_model_path,
+            f"{unique_dir}/output/metrics.json": metrics_path,
         }
 
+        in_toto_materials = {
+            minio_path: record_artifact_as_dict(local_path)
+            for minio_path, local_path in material_paths.items()
+        }
         in_toto_products = {
-            f"{unique_dir}/output/trained_model.keras": record_artifact_as_dict(trained_model_path),
-            f"{unique_dir}/output/metrics.json": record_artifact_as_dict(metrics_path),
+            minio_path: record_artifact_as_dict(local_path)
+            for minio_path, local_path in product_paths.items()
         }
 
         # Record input and output artifacts with local paths for BOM generation
         materials = {
-            f"{unique_dir}/model/{model_filename}": {
-                "sha256": record_artifact_as_dict(model_path)["sha256"],
-                "local_path": model_path,  # Pass the local path directly
-            },
-            f"{unique_dir}/dataset/{dataset_filename}": {
-                "sha256": record_artifact_as_dict(dataset_path)["sha256"],
-                "local_path": dataset_path,  # Pass the local path directly
-            },
-            f"{unique_dir}/definition/{dataset_definition_filename}": {
-                "sha256": record_artifact_as_dict(dataset_definition_path)["sha256"],
-                "local_path": dataset_definition_path,  # Pass the local path directly
-            },
+            minio_path: {
+                "sha256": in_toto_materials[minio_path]["sha256"],
+                "local_path": local_path,  # Pass the local path directly
+            }
+            for minio_path, local_path in material_paths.items()
         }
-
         products = {
-            f"{unique_dir}/output/trained_model.keras": {
-                "sha256": record_artifact_as_dict(trained_model_path)["sha256"],
-                "local_path": trained_model_path,  # Pass the local path directly
-            },
-            f"{unique_dir}/output/metrics.json": {
-                "sha256": record_artifact_as_dict(metrics_path)["sha256"],
-                "local_path": metrics_path,  # Pass the local path directly
-            },
+            minio_path: {
+                "sha256": in_toto_products[minio_path]["sha256"],
+                "local_path": local_path,  # Pass the local path directly
+            }
+            for minio_path, local_path in product_paths.items()
         }
 
         # Generate the in-toto link file
@@ -300,9 +279,8 @@ def run_training(unique_dir, model_url, dataset_url, dataset_definition_url, opt
         task_logger.info("Uploading in-toto link file to MinIO...")
         # Ensure the file in minio also has the keyid in the name by using the basename of the link file
         link_file_minio_path = f"{unique_dir}/output/{os.path.basename(link_file_path)}"
-        upload_file_to_minio(
-            link_file_path, link_file_minio_path, TRAINING_BUCKET)
-        task_logger.info("in-toto link file uploaded successfully.")
+        pending_uploads.append(output_uploads.submit(
+            upload_file_to_minio, link_file_path, link_file_minio_path, TRAINING_BUCKET))
 
         # AIBOM -------------------------------------------------------------------------
 
@@ -315,6 +293,7 @@ def run_training(unique_dir, model_url, dataset_url, dataset_definition_url, opt
             start_training_time=start_training_time,
             start_aibom_time=start_aibom_time,
             unique_dir=unique_dir,
+            static_details=worker_context["environment"],
         )
 
         # Generate BOM data
@@ -327,28 +306,33 @@ def run_training(unique_dir, model_url, dataset_url, dataset_definition_url, opt
             optional_params=optional_params,
             link_file_minio_path=link_file_minio_path,
             unique_dir=unique_dir,
+            dataset_statistics=dataset_statistics,
         )
 
         # Transform to CycloneDX format
         task_logger.info("Transforming BOM data to CycloneDX format...")
 
-        cyclonedx_bom = transform_to_cyclonedx(bom_data)
-        task_logger.info(f"Signing BOM data...")
-        sign_and_include_bom_as_property(cyclonedx_bom, private_key_path)
-        task_logger.info(f"BOM signed")
-
-        # Verify the signature (currently Signature not supported in CycloneDX so its added as a property in the metadata)
-        if not any(prop.name == "BOM Signature" for prop in cyclonedx_bom.metadata.properties):
+        cyclonedx_bom = transform_to_cyclonedx(
+            bom_data, architecture_summary=architecture_summary)
+        # Serialize once, sign those bytes and write the signed BOM
+        # (currently Signature not supported in CycloneDX so its added as a property in the metadata)
+        task_logger.info(f"Signing and serializing BOM data...")
+        bom_signature = emit_bom(
+            cyclonedx_bom, bom_path, private_key=worker_context["bom_signing_key"])
+        if not bom_signature:
             raise RuntimeError("BOM signature was not added successfully.")
-
-        task_logger.info(f"serializing BOM data...")
-        serialize_bom(cyclonedx_bom, bom_path)
-        task_logger.info(f"BOM serialized: {bom_path}")
+        task_logger.info(f"BOM signed and serialized: {bom_path}")
 
         # Upload output artifacts to MinIO
         task_logger.info("Uploading bom to MinIO...")
-        upload_file_to_minio(
-            bom_path, f"{unique_dir}/output/cyclonedx_bom.json", TRAINING_BUCKET)
+        pending_uploads.append(output_uploads.submit(
+            upload_file_to_minio, bom_path, f"{unique_dir}/output/cyclonedx_bom.json", TRAINING_BUCKET))
+
+        # Barrier: the job only succeeds once every output is stored in MinIO
+        task_logger.info("Waiting for output uploads to finish...")
+        for upload in pending_uploads:
+            upload.result()
+        task_logger.info("All output artifacts uploaded successfully.")
 
         task_logger.info("Task completed successfully.")
         result = {
@@ -362,6 +346,9 @@ def run_training(unique_dir, model_url, dataset_url, dataset_definition_url, opt
         e = ex  # Assign the exception to the variable
         task_logger.error(f"An error occurred: {str(e)}")
 
+        # Let in-flight uploads settle so none of them lands after the cleanup below
+        wait(pending_uploads)
+
         # remove from minio if the task fails
         try:
             task_logger.info(
@@ -386,6 +373,7 @@ def run_training(unique_dir, model_url, dataset_url, dataset_definition_url, opt
             "error": str(e),
         }
     finally:
+        output_uploads.shutdown(wait=True)
         task_logger.info(
             f"Task {celery_app.current_task.request.id} completed.")
 
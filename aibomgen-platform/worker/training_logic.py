@@ -1,71 +1,328 @@
+import os
+import zipfile
 import tensorflow as tf
 import pandas as pd
 import yaml
 import json
-from shared.zip_utils import ZipValidationError, validate_and_extract_zip
+from shared.zip_utils import ZipValidationError, validate_and_extract_zip, index_zip_file, read_zip_member
 import numpy as np
+from dataset_statistics import StreamingStatistics, feature_moments, get_dataset_statistics
 
+# Image formats decoded by tf.io.decode_image for image datasets
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".gif"}
 
-def load_csv_dataset_with_definition(task_logger, file_path, dataset_definition, batch_size=32):
+# CSV files larger than this are streamed in chunks instead of being loaded into memory
+CSV_STREAMING_THRESHOLD_BYTES = int(
+    os.getenv("CSV_STREAMING_THRESHOLD_BYTES", 256 * 1024 * 1024))  # 256 MB
+CSV_CHUNK_ROWS = int(os.getenv("CSV_CHUNK_ROWS", 65536))
+
+# Examples parsed per batch during the TFRecord statistics pass
+STATISTICS_BATCH_SIZE = 1024
+
+# Record compression of TFRecord datasets, set with `compression` in the dataset definition
+TFRECORD_COMPRESSION_TYPES = {"none": "", "gzip": "GZIP", "zlib": "ZLIB"}
+TFRECORD_EXTENSIONS = {".tfrecord", ".tfrecords", ".gz"}
+# Shards read at the same time, each open shard holds a reader and its buffers
+TFRECORD_MAX_OPEN_SHARDS = int(os.getenv("TFRECORD_MAX_OPEN_SHARDS", 16))
+
+# Input pipeline defaults, overridable per job with a `performance` section in the dataset definition
+DEFAULT_PERFORMANCE_PROFILE = {
+    "shuffle_buffer": 1000,  # Examples held in the shuffle buffer
+    "cache": "none",  # "none", "memory" or "disk" (cached after decoding, before shuffling)
+    "parallel_calls": "auto",  # Parallelism of map stages, "auto" lets tf.data tune it
+    "prefetch": "auto",  # Batches prepared ahead of the accelerator, "auto" lets tf.data tune it
+    "deterministic": False,  # Allow map stages to return elements out of order for throughput
+}
+
+
+def get_performance_profile(dataset_definition, cache_dir=None):
     """
-    Load and preprocess a CSV dataset based on the dataset definition.
+    Build the input pipeline performance profile of a job from its dataset definition.
+
+    Args:
+        dataset_definition (dict): The dataset definition, optionally with a `performance` section.
+        cache_dir (str, optional): Directory for on-disk caches (the job's temp directory).
+
+    Returns:
+        dict: The resolved profile, with "auto" values replaced by tf.data.AUTOTUNE.
     """
-    task_logger.info(f"Loading CSV dataset from: {file_path}")
+    profile = {**DEFAULT_PERFORMANCE_PROFILE, **
+               (dataset_definition.get("performance") or {})}
 
-    # Load the CSV file into a Pandas DataFrame
-    df = pd.read_csv(file_path)
-    task_logger.info(
-        f"CSV file loaded successfully. Number of rows: {len(df)}")
+    for key in ("parallel_calls", "prefetch"):
+        if profile[key] in ("auto", None):
+            profile[key] = tf.data.AUTOTUNE
+        else:
+            profile[key] = int(profile[key])
 
-    # Validate that all required columns are present
+    profile["shuffle_buffer"] = int(profile["shuffle_buffer"])
+    profile["cache"] = str(profile["cache"]).lower()
+    if profile["cache"] not in ("none", "memory", "disk"):
+        raise ValueError(
+            f"Unsupported cache mode in dataset definition: {profile['cache']}")
+    if profile["cache"] == "disk" and not cache_dir:
+        raise ValueError("Disk caching requires a cache directory.")
+    profile["cache_dir"] = cache_dir
+    return profile
+
+
+def build_input_pipeline(dataset, profile, batch_size, training, map_fn=None, batched_map_fn=None, name="dataset"):
+    """
+    Turn an unbatched dataset into a batched input pipeline.
+
+    Order: parallel per-example map, optional cache, shuffle (training only) before batching,
+    batch, optional vectorized map over whole batches, prefetch.
+
+    Args:
+        dataset (tf.data.Dataset): Unbatched examples (or raw records to be decoded by map_fn).
+        profile (dict): Performance profile from get_performance_profile.
+        batch_size (int): Number of examples per batch.
+        training (bool): Shuffle the examples every epoch if True.
+        map_fn (callable, optional): Per-example decoding/preprocessing function.
+        batched_map_fn (callable, optional): Function applied to whole batches (e.g. vectorized parsing).
+        name (str): Name of the on-disk cache file.
+
+    Returns:
+        tf.data.Dataset: The batched, prefetched dataset.
+    """
+    if map_fn is not None:
+        dataset = dataset.map(
+            map_fn, num_parallel_calls=profile["parallel_calls"], deterministic=profile["deterministic"])
+
+    if profile["cache"] == "memory":
+        dataset = dataset.cache()
+    elif profile["cache"] == "disk":
+        dataset = dataset.cache(os.path.join(
+            profile["cache_dir"], f"{name}.tfcache"))
+
+    if training:
+        dataset = dataset.shuffle(
+            buffer_size=profile["shuffle_buffer"], reshuffle_each_iteration=True)
+
+    dataset = dataset.batch(
+        batch_size, num_parallel_calls=profile["parallel_calls"], deterministic=profile["deterministic"])
+
+    if batched_map_fn is not None:
+        dataset = dataset.map(
+            batched_map_fn, num_parallel_calls=profile["parallel_calls"], deterministic=profile["deterministic"])
+
+    return dataset.prefetch(profile["prefetch"])
+
+
+def build_split_pipelines(train_dataset, val_dataset, profile, batch_size, map_fn=None, batched_map_fn=None):
+    """Build the training and (optional) validation input pipelines from the split datasets."""
+    train_dataset = build_input_pipeline(
+        train_dataset, profile, batch_size, training=True, map_fn=map_fn, batched_map_fn=batched_map_fn, name="train")
+    if val_dataset is not None:
+        val_dataset = build_input_pipeline(
+            val_dataset, profile, batch_size, training=False, map_fn=map_fn, batched_map_fn=batched_map_fn, name="validation")
+    return train_dataset, val_dataset
+
+
+def get_csv_columns(file_path, dataset_definition):
+    """
+    Validate the CSV header against the dataset definition.
+    Returns the feature columns, the label column and the pandas dtypes to read them with.
+    """
+    label_column = dataset_definition["label"]
     required_columns = list(dataset_definition["columns"].keys())
-    missing_columns = set(required_columns) - set(df.columns)
+    header = pd.read_csv(file_path, nrows=0).columns
+    missing_columns = set(required_columns) - set(header)
     if missing_columns:
-        task_logger.error(
-            f"CSV file is missing required columns: {missing_columns}")
         raise ValueError(
             f"CSV file is missing required columns: {missing_columns}")
-    task_logger.info("All required columns are present in the CSV file.")
 
-    # Extract features and labels
-    feature_columns = [col for col in dataset_definition["columns"].keys()
-                       if col != dataset_definition["label"]]
-    label_column = dataset_definition["label"]
+    feature_columns = [col for col in required_columns if col != label_column]
+    dtypes = {col: "float32" for col in feature_columns}
+    dtypes[label_column] = "int64"
+    return feature_columns, label_column, dtypes
+
+
+def scan_csv_dataset(file_path, feature_columns, label_column, dtypes):
+    """
+    Statistics pass over a CSV file in chunks, reading only the columns of the definition.
+    Returns a StreamingStatistics with the row count, per-feature statistics and class counts.
+    """
+    statistics = StreamingStatistics(feature_columns)
+    for chunk in pd.read_csv(file_path, usecols=feature_columns + [label_column], dtype=dtypes, chunksize=CSV_CHUNK_ROWS):
+        statistics.update(chunk[feature_columns].to_numpy(
+            dtype=np.float64), chunk[label_column].to_numpy())
+
+    if statistics.count == 0:
+        raise ValueError(f"CSV file contains no rows: {file_path}")
+    return statistics
+
+
+def load_csv_dataset_with_definition(task_logger, file_path, dataset_definition, batch_size=32, validation_split=0.0, performance_profile=None, statistics_cache_key=None):
+    """
+    Load and preprocess a CSV dataset based on the dataset definition.
+    Files larger than CSV_STREAMING_THRESHOLD_BYTES are streamed in chunks, so memory stays bounded.
+    Normalization uses the dataset statistics, which are cached under statistics_cache_key.
+    Returns the training dataset, the validation dataset (or None), their sizes in examples
+    and the dataset statistics summary.
+    """
+    task_logger.info(f"Loading CSV dataset from: {file_path}")
+
+    # Validate that all required columns are present
+    try:
+        feature_columns, label_column, dtypes = get_csv_columns(
+            file_path, dataset_definition)
+    except ValueError as e:
+        task_logger.error(str(e))
+        raise
+    task_logger.info("All required columns are present in the CSV file.")
     task_logger.info(f"Feature columns: {feature_columns}")
     task_logger.info(f"Label column: {label_column}")
 
-    features = df[feature_columns].astype("float32").values
-    labels = df[label_column].astype("int64").values
-    task_logger.info(
-        f"Extracted features and labels. Number of features: {len(features[0])}, Number of labels: {len(labels)}")
+    preprocessing_steps = dataset_definition.get("preprocessing")
+    file_size = os.path.getsize(file_path)
+    if file_size > CSV_STREAMING_THRESHOLD_BYTES:
+        task_logger.info(
+            f"CSV file is {file_size} bytes, streaming it in chunks of {CSV_CHUNK_ROWS} rows.")
+        # The statistics pass also yields the row count and the labels, a cache hit skips it entirely
+        dataset_statistics = get_dataset_statistics(
+            task_logger, statistics_cache_key,
+            lambda: scan_csv_dataset(file_path, feature_columns, label_column, dtypes))
+        num_rows = dataset_statistics["num_examples"]
+        unique_labels = np.array(
+            sorted(int(label) for label in dataset_statistics["class_counts"]), dtype=np.int64)
+        mean, std = feature_moments(dataset_statistics)
+        task_logger.info(
+            f"Scanned CSV file. Number of rows: {num_rows}, Number of labels: {len(unique_labels)}")
+
+        def _read_chunks():
+            # Re-read every epoch; only one chunk is held in memory at a time
+            for chunk in pd.read_csv(file_path, usecols=feature_columns + [label_column], dtype=dtypes, chunksize=CSV_CHUNK_ROWS):
+                features = chunk[feature_columns].to_numpy(dtype=np.float32)
+                # unique_labels is sorted, so its positions are the 0-based class indices
+                labels = np.searchsorted(
+                    unique_labels, chunk[label_column].to_numpy())
+                yield features, labels
+
+        dataset = tf.data.Dataset.from_generator(
+            _read_chunks,
+            output_signature=(
+                tf.TensorSpec(shape=(None, len(feature_columns)),
+                              dtype=tf.float32),
+                tf.TensorSpec(shape=(None,), dtype=tf.int64),
+            ),
+        )
+        if preprocessing_steps:
+            # Preprocess whole chunks with the dataset-wide statistics of the first pass
+            dataset = dataset.map(lambda features, labels: (
+                apply_preprocessing(features, preprocessing_steps, task_logger, mean=mean, std=std), labels))
+        dataset = dataset.unbatch()
+    else:
+        # Load only the columns of the definition, with their dtypes, into memory
+        df = pd.read_csv(
+            file_path, usecols=feature_columns + [label_column], dtype=dtypes)
+        num_rows = len(df)
+        task_logger.info(
+            f"CSV file loaded successfully. Number of rows: {num_rows}")
+
+        features = df[feature_columns].to_numpy(dtype=np.float32)
+        raw_labels = df[label_column].to_numpy()
+        del df
+
+        def _compute_statistics():
+            statistics = StreamingStatistics(feature_columns)
+            statistics.update(features, raw_labels)
+            return statistics
 
-    # Map labels to 0-based indices if not already 0-based
-    unique_labels = sorted(set(labels))
-    if min(unique_labels) != 0 or max(unique_labels) != len(unique_labels) - 1:
-        label_map = {v: i for i, v in enumerate(unique_labels)}
-        labels = np.array([label_map[val] for val in labels])
+        dataset_statistics = get_dataset_statistics(
+            task_logger, statistics_cache_key, _compute_statistics)
+        unique_labels, labels = np.unique(raw_labels, return_inverse=True)
+        task_logger.info(
+            f"Extracted features and labels. Number of features: {features.shape[1]}, Number of labels: {len(labels)}")
+
+        # Apply preprocessing if specified
+        if preprocessing_steps:
+            task_logger.info("Applying preprocessing steps to features.")
+            mean, std = feature_moments(dataset_statistics)
+            features = apply_preprocessing(
+                features, preprocessing_steps, task_logger, mean=mean, std=std)
+            task_logger.info("Preprocessing completed.")
+
+        # Convert to TensorFlow Dataset, the row count is the cardinality
+        task_logger.info("Converting data to TensorFlow Dataset.")
+        dataset = tf.data.Dataset.from_tensor_slices(
+            (features, labels.astype(np.int64)))
+
+    # Labels are mapped to 0-based indices if not already 0-based
+    if not np.array_equal(unique_labels, np.arange(len(unique_labels))):
+        label_map = {int(v): i for i, v in enumerate(unique_labels)}
         task_logger.info(f"Mapped labels to 0-based indices: {label_map}")
 
-    # Apply preprocessing if specified
-    if "preprocessing" in dataset_definition:
-        task_logger.info("Applying preprocessing steps to features.")
-        features = apply_preprocessing(
-            features, dataset_definition["preprocessing"], task_logger)
-        task_logger.info("Preprocessing completed.")
+    train_dataset, val_dataset, train_size, val_size = split_dataset_by_index(
+        dataset, num_rows, validation_split, task_logger)
 
-    # Convert to TensorFlow Dataset
-    task_logger.info("Converting data to TensorFlow Dataset.")
-    dataset = tf.data.Dataset.from_tensor_slices((features, labels))
-    dataset = dataset.batch(batch_size).shuffle(buffer_size=1000)
+    profile = performance_profile or get_performance_profile(
+        dataset_definition)
+    train_dataset, val_dataset = build_split_pipelines(
+        train_dataset, val_dataset, profile, batch_size)
     task_logger.info(
         f"Dataset created successfully with batch size: {batch_size}")
 
-    return dataset
+    return train_dataset, val_dataset, train_size, val_size, dataset_statistics
+
+
+def index_image_directory(dataset_path):
+    """
+    List the images of a directory with one subdirectory per class.
+    Classes and files are sorted, so the order (and thus the split) is deterministic.
+    Returns the image paths, their integer labels and the class names.
+    """
+    class_names = sorted(
+        entry for entry in os.listdir(dataset_path)
+        if os.path.isdir(os.path.join(dataset_path, entry)))
+    if not class_names:
+        raise ValueError(
+            f"No class subdirectories found in image dataset: {dataset_path}")
+
+    file_paths = []
+    labels = []
+    for label, class_name in enumerate(class_names):
+        for root, _, files in sorted(os.walk(os.path.join(dataset_path, class_name))):
+            for file_name in sorted(files):
+                if os.path.splitext(file_name)[1].lower() in IMAGE_EXTENSIONS:
+                    file_paths.append(os.path.join(root, file_name))
+                    labels.append(label)
+    return file_paths, labels, class_names
+
 
+def index_image_zip(zip_path):
+    """
+    Validate an image dataset .zip and index its images without extracting it.
+    The first path component of a member is its class, like a subdirectory of an extracted dataset.
+    Classes and members are sorted like index_image_directory, so both give the same order (and split).
+    Returns the indexed members, their integer labels and the class names.
+    """
+    images = []
+    for member in index_zip_file(zip_path):
+        parts = member.filename.replace("\\", "/").split("/")
+        # Files at the root of the archive have no class and are ignored
+        if len(parts) < 2 or os.path.splitext(parts[-1])[1].lower() not in IMAGE_EXTENSIONS:
+            continue
+        images.append(((parts[0], "/".join(parts[:-1]), parts[-1]), member))
+    class_names = sorted({key[0] for key, _ in images})
+    if not class_names:
+        raise ValueError(
+            f"No class subdirectories found in image dataset: {zip_path}")
+
+    class_indices = {name: i for i, name in enumerate(class_names)}
+    images.sort(key=lambda image: image[0])
+    members = [member for _, member in images]
+    labels = [class_indices[key[0]] for key, _ in images]
+    return members, labels, class_names
 
-def load_image_dataset(task_logger, dataset_path, dataset_definition, batch_size=32):
+
+def load_image_dataset(task_logger, dataset_path, dataset_definition, batch_size=32, validation_split=0.0, performance_profile=None):
     """
     Load and preprocess an image dataset.
+    dataset_path is either the dataset .zip, whose members are read and decoded lazily
+    without extracting it, or a directory with one subdirectory per class.
+    Returns the training dataset, the validation dataset (or None), their sizes in examples
+    and the dataset statistics summary (class counts only, pixels are not summarized).
     """
     task_logger.info(f"Loading image dataset from: {dataset_path}")
 
@@ -73,35 +330,73 @@ def load_image_dataset(task_logger, dataset_path, dataset_definition, batch_size
     image_size = tuple(dataset_definition.get("image_size", [224, 224]))
     task_logger.info(f"Using image size: {image_size}")
     preprocessing_function = tf.keras.applications.imagenet_utils.preprocess_input
+    from_zip = os.path.isfile(dataset_path)
 
     try:
-        task_logger.info("Loading images from directory...")
-        dataset = tf.keras.preprocessing.image_dataset_from_directory(
-            dataset_path,
-            image_size=image_size,
-            batch_size=batch_size
-        )
-        task_logger.info("Image dataset loaded successfully.")
+        if from_zip:
+            # Validation (limits, file types, path traversal) happens in the same index pass
+            task_logger.info("Validating and indexing images in the zip file...")
+            members, labels, class_names = index_image_zip(dataset_path)
+            sources = list(range(len(members)))
+        else:
+            task_logger.info("Indexing images from directory...")
+            sources, labels, class_names = index_image_directory(dataset_path)
+        task_logger.info(
+            f"Found {len(sources)} images belonging to {len(class_names)} classes: {class_names}")
     except Exception as e:
         task_logger.error(f"Failed to load image dataset: {str(e)}")
         raise
 
-    # Apply preprocessing if specified
-    if "preprocessing" in dataset_definition:
+    statistics = StreamingStatistics()
+    statistics.update(labels=np.array(labels))
+    dataset_statistics = statistics.summary()
+    dataset_statistics["class_names"] = class_names
+
+    # Split the image list, so validation images are never decoded for training and vice versa
+    dataset = tf.data.Dataset.from_tensor_slices((sources, labels))
+    train_dataset, val_dataset, train_size, val_size = split_dataset_by_index(
+        dataset, len(sources), validation_split, task_logger)
+
+    apply_imagenet_preprocessing = "preprocessing" in dataset_definition
+    if apply_imagenet_preprocessing:
         task_logger.info("Applying preprocessing steps to the dataset.")
-        try:
-            dataset = dataset.map(lambda x, y: (preprocessing_function(x), y))
-            task_logger.info("Preprocessing applied successfully.")
-        except Exception as e:
-            task_logger.error(f"Failed to apply preprocessing: {str(e)}")
-            raise
     else:
         task_logger.info(
             "No preprocessing steps specified in the dataset definition.")
 
+    def _read_zip_member(index):
+        return read_zip_member(dataset_path, members[int(index)])
+
+    def _read_image(source):
+        if from_zip:
+            image_bytes = tf.py_function(_read_zip_member, [source], tf.string)
+            image_bytes.set_shape([])
+            return image_bytes
+        return tf.io.read_file(source)
+
+    def _load_image(source, label):
+        image = decode_image(_read_image(source), image_size)
+        if apply_imagenet_preprocessing:
+            image = preprocessing_function(image)
+        return image, label
+
+    # Images are read and decoded in parallel map calls
+    profile = performance_profile or get_performance_profile(
+        dataset_definition)
+    train_dataset, val_dataset = build_split_pipelines(
+        train_dataset, val_dataset, profile, batch_size, map_fn=_load_image)
+
     task_logger.info(
         f"Dataset creation completed with batch size: {batch_size}")
-    return dataset
+    return train_dataset, val_dataset, train_size, val_size, dataset_statistics
+
+
+def decode_image(image_bytes, image_size):
+    """Decode a JPEG/PNG image to a float32 RGB tensor of image_size, like image_dataset_from_directory."""
+    image = tf.io.decode_image(image_bytes, channels=3, expand_animations=False)
+    image = tf.image.resize(image, image_size)
+    image.set_shape(image_size + (3,))
+    return image
 
 
 def load_tfrecord_demo(file_path, batch_size=32):
@@ -132,35 +427,109 @@ def load_tfrecord_demo(file_path, batch_size=32):
     return dataset
 
 
-def load_TFRecordDataset_with_definition(task_logger, file_path, dataset_definition, batch_size=32):
+def get_tfrecord_shards(file_path, extract_to):
+    """
+    Return the TFRecord shards of a dataset, in a stable (sorted) order.
+    The dataset is either a single TFRecord file or a .zip of shards, which is validated and extracted to extract_to.
+    """
+    if not zipfile.is_zipfile(file_path):
+        return [file_path]
+
+    members = validate_and_extract_zip(
+        file_path, extract_to, allowed_extensions=TFRECORD_EXTENSIONS)
+    shards = sorted(
+        os.path.join(extract_to, member.filename) for member in members
+        if os.path.splitext(member.filename)[1].lower() in TFRECORD_EXTENSIONS)
+    if not shards:
+        raise ValueError(f"No TFRecord shards found in dataset: {file_path}")
+    return shards
+
+
+def load_TFRecordDataset_with_definition(task_logger, file_path, dataset_definition, batch_size=32, validation_split=0.0, performance_profile=None, statistics_cache_key=None):
     """
     Load and preprocess the dataset based on the dataset definition.
     Dynamically handles feature shapes and preprocessing steps.
+    file_path is a TFRecord file or a .zip of TFRecord shards, optionally GZIP/ZLIB compressed
+    (`compression` in the dataset definition). Shards are read in parallel and records are parsed
+    in batches with tf.io.parse_example. A single statistics pass (cached under statistics_cache_key)
+    counts the records and provides the dataset summary for the BOM and the constants used for normalization.
+    Returns the training dataset, the validation dataset (or None), their sizes in examples
+    and the dataset statistics summary.
     """
-    raw_dataset = tf.data.TFRecordDataset(file_path)
+    compression = str(dataset_definition.get("compression") or "none").lower()
+    if compression not in TFRECORD_COMPRESSION_TYPES:
+        raise ValueError(
+            f"Unsupported TFRecord compression in dataset definition: {compression}")
+    compression_type = TFRECORD_COMPRESSION_TYPES[compression]
+
+    shards = get_tfrecord_shards(file_path, f"{file_path}_shards")
+
+    profile = performance_profile or get_performance_profile(
+        dataset_definition)
+    # Shards are read in parallel; the interleave stays deterministic because the
+    # index split below must see the records in the same order on every pass
+    raw_dataset = tf.data.Dataset.from_tensor_slices(shards).interleave(
+        lambda shard: tf.data.TFRecordDataset(
+            shard, compression_type=compression_type),
+        cycle_length=min(len(shards), TFRECORD_MAX_OPEN_SHARDS),
+        num_parallel_calls=profile["parallel_calls"],
+        deterministic=True,
+    )
 
     # Build feature description from dataset definition
     feature_description = {}
+    feature_names = []
     for feature, info in dataset_definition["features"].items():
         dtype = info.get("dtype", "float32")
         shape = info.get("shape", [])
         tf_dtype = tf.float32 if dtype in ["float", "float32"] else tf.int64
         feature_description[feature] = tf.io.FixedLenFeature(shape, tf_dtype)
+        size = int(np.prod(shape)) if shape else 1
+        feature_names.extend(
+            [feature] if not shape else [f"{feature}[{i}]" for i in range(size)])
 
     label_name = dataset_definition["label"]["name"]
     label_dtype = dataset_definition["label"].get("dtype", "int64")
     feature_description[label_name] = tf.io.FixedLenFeature(
         [], tf.int64 if label_dtype == "int64" else tf.float32)
 
-    def _parse_function(proto):
-        # Parse the input tf.Example proto using the feature description
-        parsed_features = tf.io.parse_single_example(
-            proto, feature_description)
+    def _flatten(parsed_features, batch):
+        return tf.concat(
+            [tf.reshape(tf.cast(parsed_features[k], tf.float32), [batch, -1])
+             for k in dataset_definition["features"].keys()],
+            axis=-1
+        )
+
+    def _parse_statistics_batch(protos):
+        parsed_features = tf.io.parse_example(protos, feature_description)
+        return _flatten(parsed_features, tf.shape(protos)[0]), parsed_features[label_name]
+
+    def _compute_statistics():
+        statistics = StreamingStatistics(feature_names)
+        batches = raw_dataset.batch(STATISTICS_BATCH_SIZE).map(
+            _parse_statistics_batch, num_parallel_calls=profile["parallel_calls"]).prefetch(tf.data.AUTOTUNE)
+        for features, labels in batches.as_numpy_iterator():
+            statistics.update(features, labels)
+        return statistics
+
+    dataset_statistics = get_dataset_statistics(
+        task_logger, statistics_cache_key, _compute_statistics)
+    num_records = dataset_statistics["num_examples"]
+    preprocessing_steps = dataset_definition.get("preprocessing")
+    mean = std = None
+    if preprocessing_steps and preprocessing_steps.get("normalize", False):
+        mean, std = feature_moments(dataset_statistics)
+    task_logger.info(
+        f"TFRecord dataset contains {num_records} records in {len(shards)} shard(s), compression: {compression}.")
+
+    def _parse_batch(protos):
+        # Parse a whole batch of serialized tf.Example protos at once
+        parsed_features = tf.io.parse_example(protos, feature_description)
 
         # Extract features as a flat tensor or dictionary based on the definition
         if dataset_definition.get("flatten_features", True):
             features = tf.concat(
-                [tf.reshape(parsed_features[k], [-1])
+                [tf.reshape(parsed_features[k], [tf.shape(protos)[0], -1])
                  for k in dataset_definition["features"].keys()],
                 axis=-1
             )
@@ -170,15 +539,61 @@ def load_TFRecordDataset_with_definition(task_logger, file_path, dataset_definit
 
         label = parsed_features[label_name]
 
-        # Apply optional preprocessing if specified
-        if "preprocessing" in dataset_definition:
+        # Apply optional preprocessing if specified, normalizing with the dataset statistics
+        if preprocessing_steps:
             features = apply_preprocessing(
-                features, dataset_definition["preprocessing"], task_logger)
+                features, preprocessing_steps, task_logger, mean=mean, std=std)
 
         return features, label
 
-    dataset = raw_dataset.map(_parse_function)
-    return dataset.batch(batch_size).shuffle(buffer_size=1000)
+    # Split the raw records, so records are only parsed for the subset they belong to
+    train_dataset, val_dataset, train_size, val_size = split_dataset_by_index(
+        raw_dataset, num_records, validation_split, task_logger)
+
+    train_dataset, val_dataset = build_split_pipelines(
+        train_dataset, val_dataset, profile, batch_size, batched_map_fn=_parse_batch)
+    return train_dataset, val_dataset, train_size, val_size, dataset_statistics
+
+
+def split_dataset_by_index(dataset, num_examples, validation_split, task_logger=None):
+    """
+    Deterministically split an unbatched dataset into training and validation subsets by element index.
+
+    Element i goes to validation when floor((i + 1) * validation_split) > floor(i * validation_split).
+    This selects exactly int(num_examples * validation_split) elements spread evenly over the stream,
+    so class-ordered sources still get a representative validation set, every epoch sees the same
+    split and no element can end up in both subsets. No pass over the data is needed.
+
+    Returns:
+        tuple: (train_dataset, val_dataset or None, train_size, val_size)
+    """
+    validation_split = float(validation_split or 0.0)
+    val_size = int(num_examples * validation_split)
+    train_size = num_examples - val_size
+    if task_logger:
+        task_logger.info(
+            f"Splitting {num_examples} examples into {train_size} training and {val_size} validation examples.")
+    if val_size == 0:
+        return dataset.apply(tf.data.experimental.assert_cardinality(num_examples)), None, num_examples, 0
+
+    def _is_validation(index, _):
+        position = tf.cast(index, tf.float64)
+        return tf.floor((position + 1.0) * validation_split) > tf.floor(position * validation_split)
+
+    indexed = dataset.enumerate()
+    train_dataset = (
+        indexed
+        .filter(lambda index, element: tf.logical_not(_is_validation(index, element)))
+        .map(lambda index, element: element)
+        .apply(tf.data.experimental.assert_cardinality(train_size))
+    )
+    val_dataset = (
+        indexed
+        .filter(_is_validation)
+        .map(lambda index, element: element)
+        .apply(tf.data.experimental.assert_cardinality(val_size))
+    )
+    return train_dataset, val_dataset, train_size, val_size
 
 
 def validate_model_and_dataset_definition(model, dataset_definition):
@@ -195,16 +610,20 @@ def validate_model_and_dataset_definition(model, dataset_definition):
             f"Model output shape {output_shape} does not match dataset output shape {dataset_definition['output_shape']}")
 
 
-def apply_preprocessing(features, preprocessing_steps, task_logger):
+def apply_preprocessing(features, preprocessing_steps, task_logger, mean=None, std=None):
     """
     Apply preprocessing steps to the features.
     Supports normalization, scaling, and other transformations.
+    Normalization uses the given dataset-wide mean/std if provided (see dataset_statistics),
+    otherwise the statistics of the features themselves.
     """
     if preprocessing_steps.get("normalize", False):
-        task_logger.info("Standardizing features (mean 0, std 1)...")
-        mean = tf.reduce_mean(features, axis=0, keepdims=True)
-        std = tf.math.reduce_std(features, axis=0, keepdims=True)
-        features = (features - mean) / (std + 1e-8)
+        if mean is None or std is None:
+            task_logger.info("Standardizing features (mean 0, std 1)...")
+            mean = tf.reduce_mean(features, axis=0, keepdims=True)
+            std = tf.math.reduce_std(features, axis=0, keepdims=True)
+        features = (features - tf.cast(mean, features.dtype)) / \
+            (tf.cast(std, features.dtype) + 1e-8)
 
     if "scale" in preprocessing_steps:
         task_logger.info("Scaling features...")
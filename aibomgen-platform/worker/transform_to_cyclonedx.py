@@ -1,12 +1,12 @@
 import datetime
+import functools
 import json
 import io
 import os
-import sys
 import yaml
 import base64
 import uuid
-import tensorflow as tf
+import zipfile
 from cyclonedx.model.bom import Bom
 from cyclonedx.model.component import Component, ComponentType
 from cyclonedx.schema import OutputFormat, SchemaVersion
@@ -21,16 +21,70 @@ from cyclonedx.validation.json import JsonStrictValidator
 from cyclonedx.exception import MissingOptionalDependencyException
 from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
 from cryptography.hazmat.primitives.serialization import load_pem_private_key
+from shared.bom_signature import BOM_SIGNATURE_PROPERTY, BOM_SIGNATURE_SCHEME_PROPERTY, JCS_SIGNATURE_SCHEME, bom_signing_payload
 
 
 lc_factory = LicenseFactory()
 
+# Write BOMs without indentation (smaller objects in storage)
+BOM_COMPACT_OUTPUT = os.getenv("BOM_COMPACT_OUTPUT", "false").lower() == "true"
+# "jcs" signs the RFC 8785 canonical JSON of the BOM, "legacy" the cyclonedx library's serialization
+BOM_SIGNATURE_SCHEME = os.getenv("BOM_SIGNATURE_SCHEME", "jcs").lower()
+# Stands in for the Base64 Ed25519 signature (64 bytes, always 88 characters) while the BOM is serialized
+SIGNATURE_PLACEHOLDER = "A" * 86 + "=="
 
-def transform_to_cyclonedx(bom_data):
+
+def summarize_model_architecture(model):
+    """
+    Summarize the layers of an in-memory Keras model.
+    Args:
+        model (keras.Model): The loaded model.
+    Returns:
+        str: Tab separated lines of layer name, type and output shape.
+    """
+    architecture_summary_lines = ["Name\tType\tShape"]
+    for layer in model.layers:
+        # Use layer.output.shape to get the output tensor's shape
+        output_shape = getattr(layer.output, 'shape', 'Unknown')
+        architecture_summary_lines.append(
+            f"{layer.name}\t{layer.__class__.__name__}\t{output_shape}"
+        )
+    return "\n".join(architecture_summary_lines)
+
+
+def summarize_keras_archive(model_path):
+    """
+    Summarize the layers of a .keras archive from its config.json, without loading TensorFlow.
+    Output shapes are not stored in the config, so only input layers report a shape.
+    Args:
+        model_path (str): Path to the .keras file.
+    Returns:
+        str: Tab separated lines of layer name, type and shape.
+    """
+    with zipfile.ZipFile(model_path, "r") as archive:
+        with archive.open("config.json") as config_file:
+            model_config = json.load(config_file)
+
+    architecture_summary_lines = ["Name\tType\tShape"]
+    for layer in model_config.get("config", {}).get("layers", []):
+        layer_config = layer.get("config", {})
+        shape = layer_config.get("batch_shape") or layer_config.get(
+            "batch_input_shape") or "Unknown"
+        if isinstance(shape, list):
+            shape = tuple(shape)
+        architecture_summary_lines.append(
+            f"{layer_config.get('name', layer.get('name', 'Unknown'))}\t{layer.get('class_name', 'Unknown')}\t{shape}"
+        )
+    return "\n".join(architecture_summary_lines)
+
+
+def transform_to_cyclonedx(bom_data, architecture_summary=None):
     """
     Transform the given BOM data into a CycloneDX format.
     Args:
         bom_data (dict): The BOM data to transform.
+        architecture_summary (str, optional): Precomputed model architecture summary
+            (see summarize_model_architecture). If omitted, it is read from the model archive.
     Returns:
         Bom: A CycloneDX formatted BOM instance.
     """
@@ -185,32 +239,19 @@ def transform_to_cyclonedx(bom_data):
     material_components = []
     dataset_hash = None
     dataset_definition_hash = None
-    architecture_summary = "Unknown"
     dataset_properties = []
 
     for material_path, material_info in bom_data.get("materials", {}).items():
         minio_path = material_path  # Use MinIO path instead of local path
         if material_path.endswith("model.keras"):
-            # Use TensorFlow to load the model and extract the architecture summary
+            # Only parse the archive's config.json if no summary was passed in
             local_path = material_info.get("local_path", "")
-            if os.path.exists(local_path):
+            if architecture_summary is None and os.path.exists(local_path):
                 try:
-                    model = tf.keras.models.load_model(local_path)
-                    # Create a formatted string to summarize the model layers
-                    architecture_summary_lines = ["Name\tType\tShape"]
-                    for layer in model.layers:
-                        # Use layer.output.shape to get the output tensor's shape
-                        output_shape = getattr(
-                            layer.output, 'shape', 'Unknown')
-                        architecture_summary_lines.append(
-                            f"{layer.name}\t{layer.__class__.__name__}\t{output_shape}"
-                        )
-                    # Join the lines into a single string
-                    architecture_summary = "\n".join(
-                        architecture_summary_lines)
+                    architecture_summary = summarize_keras_archive(local_path)
                 except Exception as e:
                     print(
-                        f"Failed to load model and extract architecture summary from {local_path}: {e}")
+                        f"Failed to extract architecture summary from {local_path}: {e}")
             continue
         elif material_path.endswith(".zip") or material_path.endswith(".csv"):
             # Handle dataset properties
@@ -239,6 +280,20 @@ def transform_to_cyclonedx(bom_data):
                     print(
                         f"Failed to read dataset definition from {local_path}: {e}")
 
+    # Add the summary of the dataset statistics pass
+    dataset_statistics = bom_data.get("dataset_statistics", {})
+    if dataset_statistics:
+        dataset_properties.extend([
+            Property(name="Number of Examples", value=str(
+                dataset_statistics.get("num_examples", "Unknown"))),
+            Property(name="Class Counts", value=json.dumps(
+                dataset_statistics.get("class_counts", {}), indent=4)),
+        ])
+        if "features" in dataset_statistics:
+            dataset_properties.append(
+                Property(name="Feature Statistics", value=json.dumps(
+                    dataset_statistics["features"], indent=4)))
+
     data_component = None
 
     # Make DATA component use dataset and dataset definition
@@ -303,7 +358,8 @@ def transform_to_cyclonedx(bom_data):
                 "framework", "Unknown")),
             Property(name="License", value=optional_params.get(
                 "license_name", "Unknown")),
-            Property(name="Architecture Summary", value=architecture_summary),
+            Property(name="Architecture Summary",
+                     value=architecture_summary or "Unknown"),
             Property(name="Trained Model Hash", value=trained_model_hash),
             Property(name="Metrics Hash", value=metrics_hash),
         ] + metrics_properties + [
@@ -339,6 +395,94 @@ def transform_to_cyclonedx(bom_data):
     return bom
 
 
+@functools.lru_cache(maxsize=None)
+def get_bom_validator(schema_version=SchemaVersion.V1_6):
+    """
+    Return the strict JSON validator for a CycloneDX schema version.
+    The validator compiles its schema on first use, so one instance is kept for the life of the process.
+    """
+    return JsonStrictValidator(schema_version)
+
+
+def emit_bom(bom, output_path, private_key=None, compact=BOM_COMPACT_OUTPUT, schema_version=SchemaVersion.V1_6, signature_scheme=BOM_SIGNATURE_SCHEME):
+    """
+    Serialize the BOM once, then validate, sign and write those same bytes.
+    The "BOM Signature" metadata property is serialized with a placeholder of the signature's length,
+    which is replaced by the signature in the output, so the BOM is never serialized a second time.
+
+    With the "jcs" scheme the signature covers the RFC 8785 canonical JSON of the document without
+    its signature property (see shared.bom_signature), so verifiers only need to parse and hash the JSON.
+    The "legacy" scheme signs the library's serialization without signature property and timestamp,
+    which verifiers have to rebuild from a deserialized Bom; that serialization is made separately.
+    Args:
+        bom (Bom): The CycloneDX BOM instance.
+        output_path (str): The file path to save the serialized BOM.
+        private_key (Ed25519PrivateKey, optional): Key to sign the BOM with (see load_bom_signing_key).
+        compact (bool): Write the JSON without indentation.
+        schema_version (SchemaVersion): The CycloneDX schema version to validate against.
+        signature_scheme (str): "jcs" or "legacy".
+    Returns:
+        str: The Base64 signature, or None if the BOM was not signed.
+    """
+    if signature_scheme not in ("jcs", "legacy"):
+        raise ValueError(f"Unsupported BOM signature scheme: {signature_scheme}")
+
+    signature = None
+    if private_key is not None:
+        signature_properties = [
+            Property(name=BOM_SIGNATURE_PROPERTY, value=SIGNATURE_PLACEHOLDER)]
+        if signature_scheme == "jcs":
+            # The scheme property is part of the signed content
+            signature_properties.append(
+                Property(name=BOM_SIGNATURE_SCHEME_PROPERTY, value=JCS_SIGNATURE_SCHEME))
+        else:
+            # Remove the timestamp field for deterministic serialization
+            bom.metadata.timestamp = None
+            signature = private_key.sign(
+                JsonV1Dot6(bom).output_as_string(indent=4).encode())
+        bom.metadata.properties = bom.metadata.properties.union(
+            signature_properties)
+
+    # Serialize the BOM (with the placeholder signature, if signed)
+    output_json = JsonV1Dot6(bom).output_as_string(
+        indent=None if compact else 4)
+
+    # Validation
+    try:
+        validation_errors = get_bom_validator(
+            schema_version).validate_str(output_json)
+        if validation_errors:
+            raise ValueError(
+                f"BOM validation failed: {repr(validation_errors)}")
+        print("JSON valid")
+    except MissingOptionalDependencyException as error:
+        print("JSON validation was skipped due to", error)
+
+    encoded_signature = None
+    if private_key is not None:
+        if signature is None:
+            # The signing payload excludes the signature property, so the placeholder is not signed
+            signature = private_key.sign(
+                bom_signing_payload(json.loads(output_json)))
+        encoded_signature = base64.b64encode(signature).decode()
+        if output_json.count(SIGNATURE_PLACEHOLDER) != 1:
+            raise ValueError(
+                "BOM signature placeholder not found exactly once in the serialized BOM.")
+        output_json = output_json.replace(
+            SIGNATURE_PLACEHOLDER, encoded_signature)
+
+        # Keep the model in line with the written BOM
+        bom.metadata.properties = [
+            prop for prop in bom.metadata.properties if prop.name != BOM_SIGNATURE_PROPERTY
+        ] + [Property(name=BOM_SIGNATURE_PROPERTY, value=encoded_signature)]
+
+    # Write the JSON output to the file
+    with open(output_path, "w") as file:
+        file.write(output_json)
+    print(f"Final AIBoM generated at {output_path}")
+    return encoded_signature
+
+
 def serialize_bom(bom, output_path, schema_version=SchemaVersion.V1_6):
     """
     Serialize the BOM to a file in JSON format and validate it.
@@ -347,40 +491,8 @@ def serialize_bom(bom, output_path, schema_version=SchemaVersion.V1_6):
         output_path (str): The file path to save the serialized BOM.
         schema_version (SchemaVersion): The CycloneDX schema version to use.
     """
-    # Generate JSON output
     try:
-        json_outputter = JsonV1Dot6(bom)
-        serialized_json = json_outputter.output_as_string(indent=4)
-
-        # Manually format the output using json.dumps() to pretty print it
-        pretty_json = json.dumps(json.loads(serialized_json), indent=4)
-
-        # Validation
-
-        json_validator = JsonStrictValidator(schema_version)
-        try:
-            validation_errors = json_validator.validate_str(pretty_json)
-            if validation_errors:
-                print("JSON invalid", "ValidationError:", repr(
-                    validation_errors), sep="\n", file=sys.stderr)
-                sys.exit(2)
-            print("JSON valid")
-        except MissingOptionalDependencyException as error:
-            print("JSON validation was skipped due to", error)
-
-        # Write the JSON output to the file
-        try:
-            with open(output_path, "w") as file:
-                file.write(pretty_json)
-        except FileExistsError:
-            print(f"File {output_path} already exists, overwriting...")
-            # Remove existing file before writing new one
-            os.remove(output_path)
-            with open(output_path, "w") as file:
-                file.write(pretty_json)
-        finally:
-            print(f"Final AIBoM generated at {output_path}")
-
+        emit_bom(bom, output_path, schema_version=schema_version)
     except MissingOptionalDependencyException as error:
         print(
             f"Serialization failed due to missing optional dependency: {error}")
@@ -421,9 +533,26 @@ def sign_bom(bom_path, private_key_path, signature_path):
         print(f"Failed to sign BOM: {e}")
 
 
-def sign_and_include_bom_as_property(bom, private_key_path):
+def load_bom_signing_key(private_key_path):
+    """
+    Load the Ed25519 private key used to sign BOMs from PEM format.
+    Args:
+        private_key_path (str): Path to the PEM private key.
+    Returns:
+        Ed25519PrivateKey: The private key.
+    """
+    with open(private_key_path, "rb") as key_file:
+        private_key = load_pem_private_key(key_file.read(), password=None)
+    if not isinstance(private_key, Ed25519PrivateKey):
+        raise ValueError(
+            "The provided private key is not an Ed25519 key.")
+    return private_key
+
+
+def sign_and_include_bom_as_property(bom, private_key_path=None, private_key=None):
     """
     Sign the BOM and include the signature as a property in the BOM metadata.
+    Pass an already loaded private_key (see load_bom_signing_key) to avoid reading the PEM file again.
     """
     try:
         # Remove the timestamp field for deterministic serialization
@@ -434,11 +563,8 @@ def sign_and_include_bom_as_property(bom, private_key_path):
         serialized_json = json_outputter.output_as_string(indent=4)
 
         # Load the private key from PEM format
-        with open(private_key_path, "rb") as key_file:
-            private_key = load_pem_private_key(key_file.read(), password=None)
-            if not isinstance(private_key, Ed25519PrivateKey):
-                raise ValueError(
-                    "The provided private key is not an Ed25519 key.")
+        if private_key is None:
+            private_key = load_bom_signing_key(private_key_path)
 
         # Sign the serialized BOM content
         signature = private_key.sign(serialized_json.encode())
@@ -0,0 +1,103 @@
+import logging
+import threading
+import tensorflow as tf
+from celery.signals import worker_process_init
+from shared.in_toto_utils import load_signer
+from environment_extractor import extract_static_environment_details
+from transform_to_cyclonedx import load_bom_signing_key
+
+# Persistent worker keys, mounted as Docker secrets
+WORKER_PRIVATE_KEY_PATH = "/run/secrets/worker_private_key"
+WORKER_PUBLIC_KEY_PATH = "/run/secrets/worker_public_key"
+
+logger = logging.getLogger(__name__)
+
+# State shared by every task of this worker process, built once by initialize_worker_context
+_worker_context = None
+_worker_context_lock = threading.Lock()
+
+
+def select_training_devices(task_logger):
+    """
+    Make the first GPU (or the CPU if there is none) the only visible device.
+    Visible devices can only be set before the TensorFlow runtime initializes, so this runs once per process.
+
+    Returns:
+        dict: The names of the available GPUs and CPUs.
+    """
+    gpus = tf.config.list_physical_devices('GPU')
+    if not gpus:
+        task_logger.warning("No GPU devices found!")
+    else:
+        task_logger.info(f"GPUs available: {[gpu.name for gpu in gpus]}")
+
+    cpus = tf.config.list_physical_devices('CPU')
+    if not cpus:
+        task_logger.warning("No CPU devices found!")
+    else:
+        task_logger.info(f"CPUs available: {[cpu.name for cpu in cpus]}")
+
+    # Device selection
+    if len(gpus) > 0 and len(cpus) > 0:
+        task_logger.info(
+            "Both GPU and CPU devices are available. Using GPU for training.")
+        tf.config.set_visible_devices(gpus[0], 'GPU')
+    elif len(cpus) > 0:
+        task_logger.info(
+            "Only CPU devices are available. Using CPU for training.")
+        tf.config.set_visible_devices(cpus[0], 'CPU')
+    else:
+        raise RuntimeError("No available devices for training.")
+
+    # Initialize the runtime now rather than during the first task
+    tf.constant(0)
+
+    return {
+        "gpus": [gpu.name for gpu in gpus],
+        "cpus": [cpu.name for cpu in cpus],
+    }
+
+
+def initialize_worker_context(task_logger=logger):
+    """
+    Build the per-process worker state: training devices, the in-toto signer, the BOM signing key
+    and a snapshot of the static environment details (platform, GPUs, Docker).
+
+    Args:
+        task_logger (Logger, optional): Logger for the initialization messages.
+
+    Returns:
+        dict: The worker context.
+    """
+    global _worker_context
+    with _worker_context_lock:
+        if _worker_context is not None:
+            return _worker_context
+
+        task_logger.info("Initializing worker process context...")
+        devices = select_training_devices(task_logger)
+        _worker_context = {
+            "devices": devices,
+            "signer": load_signer(WORKER_PRIVATE_KEY_PATH, WORKER_PUBLIC_KEY_PATH),
+            "bom_signing_key": load_bom_signing_key(WORKER_PRIVATE_KEY_PATH),
+            "environment": extract_static_environment_details(task_logger),
+        }
+        task_logger.info("Worker process context initialized.")
+        return _worker_context
+
+
+def get_worker_context(task_logger=logger):
+    """Return the worker context, initializing it if this process has not done so yet (e.g. a solo pool)."""
+    if _worker_context is not None:
+        return _worker_context
+    return initialize_worker_context(task_logger)
+
+
+@worker_process_init.connect
+def _initialize_worker_process(**kwargs):
+    # Runs in every pool process right after it is forked, before it accepts tasks
+    try:
+        initialize_worker_context()
+    except Exception as e:
+        # Leave it to the first task to retry and report the error
+        logger.error(f"Failed to initialize the worker process context: {str(e)}")